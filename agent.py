@@ -1,38 +1,469 @@
-import openai
-import re
-from typing import List, Dict, Optional
+import asyncio
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Deque, Iterable, Iterator, List, Dict, Optional, Tuple
 import traceback
+import weakref
+from cache import ResponseCache, get_response_cache
+from chunker import CHUNK_TOKENS, OVERLAP_TOKENS, chunk_pages, chunk_text, count_tokens
+from card_parser import StreamingCardParser, fallback_parse, parse_flashcards, parse_json_flashcards
+from difficulty import assign_difficulty
+from http_pool import REQUEST_TIMEOUT, get_async_http_client, get_http_client
+from metrics import increment, record_usage, timed
+from salience import select_chunks
+from scheduler import RequestScheduler, scheduler_from_env
+from singleflight import SingleFlight, get_single_flight
+
+if TYPE_CHECKING:
+    import openai
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+VALIDATION_TTL = 600  # seconds a successful connection test stays valid
+MAX_WORKERS = 4  # concurrent generation requests per document
+TEMPERATURE = 0.7
+MAX_TOKENS = 2000
+PROMPT_VERSION = 1  # bump whenever _build_prompt changes so cached responses expire
+OUTPUT_FORMATS = ("text", "json")  # Q:/A: free text, or JSON mode with schema validation
+CANCEL_POLL = 0.2  # seconds between cancellation checks while waiting for chunks
+
+# Called after each chunk with (chunks done, chunks total or None while input is still read, its cards)
+ProgressCallback = Callable[[int, Optional[int], List[Dict[str, str]]], None]
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is cancelled before all chunks are done."""
 
 class Agent:
-    def __init__(self, openai_api_key: str):
-        """Minimal initialization approach."""
+    def __init__(self, openai_api_key: str, model: str = DEFAULT_MODEL,
+                 cache: Optional[ResponseCache] = None, base_url: Optional[str] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 flights: Optional[SingleFlight] = None):
+        """Create the OpenAI client. The connection test is deferred to validate().
+
+        ``base_url`` points the client at another OpenAI-compatible endpoint, such as
+        a local stand-in server; it defaults to OPENAI_BASE_URL or the public API.
+        Every API call goes through ``scheduler``, which owns rate limiting and
+        retries, so the client's own retries are disabled. Blocking calls share the
+        process-wide HTTP connection pool; async calls use one pool per event loop.
+        Identical chunk requests in flight at the same time, from any thread or
+        app process, are coalesced by ``flights`` into a single API call.
+        """
+        # Imported here so the app can render before the OpenAI SDK is loaded
+        import openai
         print(f"OpenAI library version: {openai.__version__}")
         
         if not openai_api_key:
             raise Exception("API key is required")
         
-        # The most basic initialization possible
-        self.client = openai.OpenAI(api_key=openai_api_key)
+        self.model = model
+        # Resolved here so cache and coalescing keys tell a stand-in server from the public API
+        self.base_url = resolve_base_url(base_url)
+        self._api_key = openai_api_key
+        self.cache = cache if cache is not None else get_response_cache()
+        self.scheduler = scheduler if scheduler is not None else scheduler_from_env()
+        self.flights = flights if flights is not None else get_single_flight()
+        self.client = openai.OpenAI(
+            api_key=openai_api_key, base_url=self.base_url,
+            max_retries=0, timeout=REQUEST_TIMEOUT, http_client=get_http_client()
+        )
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._validated_at: Optional[float] = None
+        self._validate_lock = threading.Lock()
+        self.format_stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    def validate(self, ttl: float = VALIDATION_TTL) -> None:
+        """Run the connection test, at most once every ``ttl`` seconds."""
+        with self._validate_lock:
+            if self._validated_at is not None and time.monotonic() - self._validated_at < ttl:
+                return
+            
+            try:
+                self.scheduler.call(lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": "test"}],
+                    max_tokens=1
+                ), estimated_tokens=2)
+            except Exception as e:
+                raise Exception(f"Connection test failed: {e}")
+            
+            self._validated_at = time.monotonic()
+            print("✓ OpenAI client initialized successfully!")
+
+    def generate_flashcards(self, text: str, subject: Optional[str] = None,
+                            chunk_tokens: int = CHUNK_TOKENS,
+                            overlap_tokens: int = OVERLAP_TOKENS,
+                            max_workers: int = MAX_WORKERS,
+                            use_cache: bool = True,
+                            output_format: str = "text",
+                            progress: Optional[ProgressCallback] = None,
+                            cancel: Optional[threading.Event] = None,
+                            max_calls: Optional[int] = None,
+                            token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Generate flashcards from the whole input text using OpenAI API.
+
+        The text is split into token-budgeted chunks at page, heading and paragraph
+        boundaries, which are sent concurrently through a bounded thread pool; the
+        per-chunk cards are merged in chunk order. ``progress`` is told about every
+        finished chunk, and setting ``cancel`` stops the generation with
+        GenerationCancelled. With ``max_calls`` or ``token_budget`` only the chunks
+        covering the most key terms of the document within that budget are sent.
+        """
+        chunks = self._within_budget(chunk_text(text, chunk_tokens, overlap_tokens), max_calls, token_budget)
+        if not chunks:
+            raise Exception("Failed to generate flashcards: no content to process")
+        
+        if len(chunks) == 1 and progress is None and cancel is None:
+            return self._generate_chunk(chunks[0], subject, use_cache, output_format)
+        
+        return self._generate_from_chunks(chunks, subject, max_workers, use_cache, output_format,
+                                          progress, cancel, len(chunks))
+
+    async def agenerate_flashcards(self, text: str, subject: Optional[str] = None,
+                                   chunk_tokens: int = CHUNK_TOKENS,
+                                   overlap_tokens: int = OVERLAP_TOKENS,
+                                   max_concurrency: Optional[int] = None,
+                                   use_cache: bool = True,
+                                   output_format: str = "text",
+                                   progress: Optional[ProgressCallback] = None,
+                                   cancel: Optional[threading.Event] = None,
+                                   max_calls: Optional[int] = None,
+                                   token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Async version of generate_flashcards.
+
+        All chunks are requested concurrently on the running event loop, without a
+        thread per request; the scheduler's adaptive limit bounds how many are in
+        flight, and ``max_concurrency`` optionally caps this document further. Many
+        documents can be generated at once with asyncio.gather, and blocking code
+        can call this through http_pool.run_sync. Cancelling, through ``cancel`` or
+        by cancelling the task, aborts the requests still in flight.
+        """
+        chunks = self._within_budget(chunk_text(text, chunk_tokens, overlap_tokens), max_calls, token_budget)
+        if not chunks:
+            raise Exception("Failed to generate flashcards: no content to process")
+        
+        if len(chunks) == 1 and progress is None and cancel is None:
+            return await self._agenerate_chunk(chunks[0], subject, use_cache, output_format)
         
-        # Quick test
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        
+        async def generate(chunk: str) -> List[Dict[str, str]]:
+            if semaphore is None:
+                return await self._agenerate_chunk(chunk, subject, use_cache, output_format)
+            async with semaphore:
+                return await self._agenerate_chunk(chunk, subject, use_cache, output_format)
+        
+        tasks = [asyncio.ensure_future(generate(chunk)) for chunk in chunks]
+        pending = set(tasks)
+        done = 0
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
+            while pending:
+                finished, pending = await asyncio.wait(
+                    pending, timeout=CANCEL_POLL if cancel is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if cancel is not None and cancel.is_set():
+                    raise GenerationCancelled("Generation was cancelled")
+                for task in finished:
+                    done += 1
+                    if progress is not None:
+                        progress(done, len(chunks), task.result() if not task.exception() else [])
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        flashcards: List[Dict[str, str]] = []
+        errors: List[BaseException] = []
+        for index, task in enumerate(tasks, 1):
+            if task.exception() is not None:
+                print(f"Chunk {index}/{len(chunks)} failed: {task.exception()}")
+                errors.append(task.exception())
+            else:
+                flashcards.extend(task.result())
+        
+        if not flashcards:
+            raise errors[0] if errors else Exception("Failed to generate flashcards: no cards were produced")
+        
+        return flashcards
+
+    def generate_flashcards_from_pages(self, pages: Iterable[Tuple[int, str]],
+                                       subject: Optional[str] = None,
+                                       chunk_tokens: int = CHUNK_TOKENS,
+                                       overlap_tokens: int = OVERLAP_TOKENS,
+                                       max_workers: int = MAX_WORKERS,
+                                       use_cache: bool = True,
+                                       output_format: str = "text",
+                                       progress: Optional[ProgressCallback] = None,
+                                       cancel: Optional[threading.Event] = None,
+                                       max_calls: Optional[int] = None,
+                                       token_budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Generate flashcards from a lazy stream of (page_number, text) pairs.
+
+        Chunks are submitted as soon as enough pages have been read, so generation
+        for the first pages overlaps with reading the rest of the document. The
+        chunk total passed to ``progress`` is None until every page has been read.
+        A budget needs every chunk to choose from, so with ``max_calls`` or
+        ``token_budget`` all pages are read before the first request.
+        """
+        chunks = chunk_pages(pages, chunk_tokens, overlap_tokens)
+        if max_calls is None and token_budget is None:
+            return self._generate_from_chunks(chunks, subject, max_workers, use_cache, output_format,
+                                              progress, cancel)
+        
+        chunks = self._within_budget(list(chunks), max_calls, token_budget)
+        return self._generate_from_chunks(chunks, subject, max_workers, use_cache, output_format,
+                                          progress, cancel, len(chunks))
+
+    def _within_budget(self, chunks: List[str], max_calls: Optional[int],
+                       token_budget: Optional[int]) -> List[str]:
+        """Keep the most salient chunks when a call or token budget is set."""
+        if max_calls is None and token_budget is None:
+            return chunks
+        
+        with timed("salience"):
+            selected = select_chunks(chunks, max_calls, token_budget)
+        if chunks and not selected:
+            raise Exception(f"Failed to generate flashcards: every chunk exceeds the budget of {token_budget} tokens")
+        if len(selected) < len(chunks):
+            print(f"Budget mode: generating from {len(selected)} of {len(chunks)} chunks")
+            increment("chunks_skipped", len(chunks) - len(selected))
+        return selected
+
+    def _generate_from_chunks(self, chunks: Iterable[str], subject: Optional[str],
+                              max_workers: int, use_cache: bool,
+                              output_format: str,
+                              progress: Optional[ProgressCallback] = None,
+                              cancel: Optional[threading.Event] = None,
+                              total: Optional[int] = None) -> List[Dict[str, str]]:
+        """Map chunks over a bounded thread pool and merge the cards in chunk order.
+
+        At most ``2 * max_workers`` chunks are held in flight, so a lazy chunk
+        iterator is only consumed as fast as the pool can keep up. On cancellation
+        queued chunks are dropped and only requests already sent are waited for.
+        """
+        flashcards: List[Dict[str, str]] = []
+        errors: List[Exception] = []
+        pending: Deque[Future] = deque()
+        submitted = 0
+        done = 0
+        
+        def check_cancelled():
+            if cancel is not None and cancel.is_set():
+                for future in pending:
+                    future.cancel()
+                raise GenerationCancelled("Generation was cancelled")
+        
+        def collect(total: Optional[int]):
+            nonlocal done
+            future = pending[0]
+            while cancel is not None and not wait([future], timeout=CANCEL_POLL).done:
+                check_cancelled()
+            check_cancelled()
+            pending.popleft()
+            done += 1
+            try:
+                cards = future.result()
+            except Exception as e:
+                print(f"Chunk {done} failed: {e}")
+                errors.append(e)
+                cards = []
+            flashcards.extend(cards)
+            if progress is not None:
+                progress(done, total, cards)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk in chunks:
+                check_cancelled()
+                if len(pending) >= 2 * max_workers:
+                    collect(total)
+                pending.append(executor.submit(
+                    contextvars.copy_context().run, self._generate_chunk, chunk, subject, use_cache, output_format
+                ))
+                submitted += 1
+            while pending:
+                collect(submitted)
+        
+        if not submitted:
+            raise Exception("Failed to generate flashcards: no content to process")
+        if not flashcards:
+            raise errors[0] if errors else Exception("Failed to generate flashcards: no cards were produced")
+        
+        return flashcards
+
+    def stream_flashcards(self, text: str, subject: Optional[str] = None,
+                          chunk_tokens: int = CHUNK_TOKENS,
+                          overlap_tokens: int = OVERLAP_TOKENS,
+                          max_workers: int = MAX_WORKERS,
+                          use_cache: bool = True,
+                          output_format: str = "text",
+                          progress: Optional[ProgressCallback] = None,
+                          cancel: Optional[threading.Event] = None,
+                          max_calls: Optional[int] = None,
+                          token_budget: Optional[int] = None) -> Iterator[Dict[str, str]]:
+        """Yield flashcards one by one as soon as each card is complete.
+
+        The first chunk is streamed from the API and parsed incrementally, while the
+        remaining chunks are generated in the background and yielded in chunk order.
+        JSON output cannot be parsed incrementally, so in that mode the first chunk's
+        cards arrive together once its response is complete. ``progress`` is told
+        about every card of the streamed first chunk as it is parsed and about
+        every other chunk once, with all of its cards; setting ``cancel`` stops
+        the stream with GenerationCancelled. Budgets work as in generate_flashcards.
+        """
+        chunks = self._within_budget(chunk_text(text, chunk_tokens, overlap_tokens), max_calls, token_budget)
+        if not chunks:
+            raise Exception("Failed to generate flashcards: no content to process")
+        
+        produced = 0
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks) - 1)))
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, self._generate_chunk, chunk, subject, use_cache, output_format
             )
-            print("✓ OpenAI client initialized successfully!")
-        except Exception as e:
-            raise Exception(f"Connection test failed: {e}")
+            for chunk in chunks[1:]
+        ]
+        
+        def check_cancelled():
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled("Generation was cancelled")
+        
+        def chunk_done(cards: List[Dict[str, str]]):
+            nonlocal done, produced
+            done += 1
+            produced += len(cards)
+            if progress is not None:
+                progress(done, len(chunks), cards)
+        
+        try:
+            first_cards: List[Dict[str, str]] = []
+            try:
+                if output_format == "json":
+                    first_cards = self._generate_chunk(chunks[0], subject, use_cache, output_format)
+                else:
+                    for card in self._stream_chunk(chunks[0], subject, use_cache):
+                        check_cancelled()
+                        produced += 1
+                        # Streamed cards are reported one by one; every other chunk in one batch
+                        if progress is not None:
+                            progress(done, len(chunks), [card])
+                        yield card
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                if not futures:
+                    raise
+                print(f"Chunk 1/{len(chunks)} failed: {e}")
+            chunk_done(first_cards)
+            yield from first_cards
+            
+            for index, future in enumerate(futures, 2):
+                while cancel is not None and not wait([future], timeout=CANCEL_POLL).done:
+                    check_cancelled()
+                check_cancelled()
+                try:
+                    cards = future.result()
+                except Exception as e:
+                    print(f"Chunk {index}/{len(chunks)} failed: {e}")
+                    cards = []
+                chunk_done(cards)
+                yield from cards
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        
+        if not produced:
+            raise Exception("Failed to generate flashcards: no cards were produced")
 
-    def generate_flashcards(self, text: str, subject: Optional[str] = None) -> List[Dict[str, str]]:
-        """Generate flashcards from input text using OpenAI API."""
+    def _stream_chunk(self, text: str, subject: Optional[str] = None,
+                      use_cache: bool = True) -> Iterator[Dict[str, str]]:
+        """Stream a single chunk and yield each card once its answer is complete."""
+        cache_key = self._cache_key(text, subject)
+        cached = self.cache.get_cards(cache_key) if use_cache else None
+        if cached is not None:
+            increment("cache_hits")
+            yield from cached
+            return
+        
+        prompt = self._build_prompt(text, subject)
+        parser = StreamingCardParser()
         
+        try:
+            # Retries cover opening the stream; a stream that breaks midway fails the chunk
+            stream = self.scheduler.call(lambda: self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE,
+                stream=True
+            ), self._estimate_tokens(prompt))
+            flashcards = []
+            for event in stream:
+                if not event.choices:
+                    continue
+                delta = event.choices[0].delta.content
+                if delta:
+                    for card in parser.feed(delta):
+                        flashcards.append(dict(card))
+                        yield card
+            for card in parser.close():
+                flashcards.append(dict(card))
+                yield card
+            record_usage(count_tokens(prompt), count_tokens(parser.content))
+            
+            # Unstructured responses only become parseable once they are complete
+            if parser.count == 0:
+                increment("parse_fallbacks")
+                for card in self._fallback_parse(parser.content):
+                    flashcards.append(dict(card))
+                    yield card
+            
+            if flashcards and use_cache:
+                self.cache.set_cards(cache_key, flashcards)
+                
+        except Exception as e:
+            print(f"Error streaming flashcards: {e}")
+            raise Exception(f"Failed to generate flashcards: {str(e)}")
+
+    def _cache_key(self, text: str, subject: Optional[str], output_format: str = "text") -> str:
+        return ResponseCache.make_key(
+            text, subject, self.model, TEMPERATURE, PROMPT_VERSION, output_format, self.base_url
+        )
+
+    def _flight_key(self, text: str, subject: Optional[str], output_format: str) -> str:
+        """Key under which identical in-flight requests coalesce; whitespace differences do not count."""
+        return self._cache_key(" ".join(text.split()), subject, output_format)
+
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Tokens a request counts against the quota: the prompt plus the completion limit."""
+        return count_tokens(prompt) + MAX_TOKENS
+
+    def _build_prompt(self, text: str, subject: Optional[str] = None, output_format: str = "text") -> str:
+        """Build the flashcard generation prompt for one chunk of text."""
+        with timed("prompt"):
+            return self._prompt_text(text, subject, output_format)
+
+    def _prompt_text(self, text: str, subject: Optional[str], output_format: str) -> str:
         subject_context = ""
         if subject and subject != "General":
             subject_context = f"Focus on {subject} concepts and terminology. "
         
-        prompt = f"""You are an expert educator creating study flashcards. {subject_context}
+        if output_format == "json":
+            return f"""You are an expert educator creating study flashcards. {subject_context}
+Create 10-12 flashcards covering the key concepts, definitions and facts in the text below. Questions must be clear and specific, answers complete but concise (1-3 sentences).
+Respond in JSON: {{"cards": [{{"q": "question", "a": "answer"}}]}}
+
+Text:
+{text}"""
+        
+        return f"""You are an expert educator creating study flashcards. {subject_context}
 
 Create exactly 10-12 high-quality flashcards from the following educational content.
 
@@ -56,132 +487,177 @@ Guidelines:
 - Vary question types: definitions, explanations, applications
 
 Text to analyze:
-{text[:3000]}
+{text}
 
 Generate the flashcards now:"""
 
+    def _generate_chunk(self, text: str, subject: Optional[str] = None,
+                        use_cache: bool = True, output_format: str = "text") -> List[Dict[str, str]]:
+        """Generate flashcards for a single prompt-sized chunk."""
+        cache_key, cached = self._lookup_chunk(text, subject, use_cache, output_format)
+        if cached is not None:
+            return cached
+        if not use_cache:
+            # Bypassing the cache asks for fresh cards, so nothing is shared
+            return self._request_chunk(text, subject, output_format, cache_key, use_cache)
+        
+        return self.flights.do(
+            self._flight_key(text, subject, output_format),
+            lambda: self._request_chunk(text, subject, output_format, cache_key, use_cache)
+        )
+
+    async def _agenerate_chunk(self, text: str, subject: Optional[str] = None,
+                               use_cache: bool = True, output_format: str = "text") -> List[Dict[str, str]]:
+        """Async version of _generate_chunk."""
+        cache_key, cached = self._lookup_chunk(text, subject, use_cache, output_format)
+        if cached is not None:
+            return cached
+        if not use_cache:
+            return await self._arequest_chunk(text, subject, output_format, cache_key, use_cache)
+        
+        return await self.flights.ado(
+            self._flight_key(text, subject, output_format),
+            lambda: self._arequest_chunk(text, subject, output_format, cache_key, use_cache)
+        )
+
+    def _request_chunk(self, text: str, subject: Optional[str], output_format: str,
+                       cache_key: str, use_cache: bool) -> List[Dict[str, str]]:
+        """Call the API for one chunk and parse its cards."""
+        prompt, request = self._chunk_request(text, subject, output_format)
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=2000,
-                temperature=0.7
+            response = self.scheduler.call(
+                lambda: self.client.chat.completions.create(**request), self._estimate_tokens(prompt)
             )
-            content = response.choices[0].message.content.strip()
-            
-            flashcards = self._parse_flashcards(content)
-            
-            if not flashcards:
-                raise Exception("No flashcards could be parsed from the response")
+            return self._cards_from_response(response, output_format, cache_key, use_cache)
             
-            return flashcards
+        except Exception as e:
+            print(f"Error generating flashcards: {e}")
+            raise Exception(f"Failed to generate flashcards: {str(e)}")
+
+    async def _arequest_chunk(self, text: str, subject: Optional[str], output_format: str,
+                              cache_key: str, use_cache: bool) -> List[Dict[str, str]]:
+        """Async version of _request_chunk."""
+        prompt, request = self._chunk_request(text, subject, output_format)
+        client = self._async_client()
+        try:
+            response = await self.scheduler.acall(
+                lambda: client.chat.completions.create(**request), self._estimate_tokens(prompt)
+            )
+            return self._cards_from_response(response, output_format, cache_key, use_cache)
             
         except Exception as e:
             print(f"Error generating flashcards: {e}")
             raise Exception(f"Failed to generate flashcards: {str(e)}")
 
+    def _async_client(self) -> "openai.AsyncOpenAI":
+        """The async client of the running event loop, on that loop's shared connection pool."""
+        import openai
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=self._api_key, base_url=self.base_url,
+                max_retries=0, timeout=REQUEST_TIMEOUT, http_client=get_async_http_client()
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _lookup_chunk(self, text: str, subject: Optional[str], use_cache: bool,
+                      output_format: str) -> Tuple[str, Optional[List[Dict[str, str]]]]:
+        """Validate the output format and return the chunk's cache key and cached cards, if any."""
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception(f"Unknown output format: {output_format}")
+        
+        cache_key = self._cache_key(text, subject, output_format)
+        if use_cache:
+            cached = self.cache.get_cards(cache_key)
+            if cached is not None:
+                increment("cache_hits")
+                return cache_key, cached
+        return cache_key, None
+
+    def _chunk_request(self, text: str, subject: Optional[str], output_format: str) -> Tuple[str, Dict[str, object]]:
+        """Build the prompt and the chat completion arguments for one chunk."""
+        prompt = self._build_prompt(text, subject, output_format)
+        request = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE
+        }
+        if output_format == "json":
+            request["response_format"] = {"type": "json_object"}
+        return prompt, request
+
+    def _cards_from_response(self, response, output_format: str, cache_key: str,
+                             use_cache: bool) -> List[Dict[str, str]]:
+        """Parse a completion into flashcards, record its usage and cache the cards."""
+        content = response.choices[0].message.content.strip()
+        
+        if output_format == "json":
+            flashcards = self._parse_json_flashcards(content)
+        else:
+            flashcards = self._parse_flashcards(content)
+        self._record_generation(output_format, response, len(flashcards))
+        
+        if not flashcards:
+            raise Exception("No flashcards could be parsed from the response")
+        
+        if use_cache:
+            self.cache.set_cards(cache_key, flashcards)
+        
+        return flashcards
+
+    def _record_generation(self, output_format: str, response, cards: int):
+        """Accumulate token usage, cards and parse failures per output format."""
+        usage = getattr(response, "usage", None)
+        with self._stats_lock:
+            stats = self.format_stats.setdefault(output_format, {
+                "requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cards": 0, "parse_failures": 0
+            })
+            stats["requests"] += 1
+            stats["cards"] += cards
+            if not cards:
+                stats["parse_failures"] += 1
+            if usage is not None:
+                stats["prompt_tokens"] += usage.prompt_tokens or 0
+                stats["completion_tokens"] += usage.completion_tokens or 0
+
+    def tokens_per_card(self, output_format: str = "text") -> Optional[float]:
+        """Average prompt plus completion tokens spent per generated card."""
+        stats = self.format_stats.get(output_format)
+        if not stats or not stats["cards"]:
+            return None
+        return (stats["prompt_tokens"] + stats["completion_tokens"]) / stats["cards"]
+
     def _parse_flashcards(self, content: str) -> List[Dict[str, str]]:
         """Parse the AI response into structured flashcard data."""
-        flashcards = []
-        
         try:
-            # Split by blank lines to get individual flashcards
-            sections = re.split(r'\n\s*\n', content.strip())
-            
-            for section in sections:
-                section = section.strip()
-                if not section:
-                    continue
-                
-                # Look for Q: and A: patterns
-                lines = section.split('\n')
-                question = ""
-                answer = ""
-                
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('Q:'):
-                        question = line[2:].strip()
-                    elif line.startswith('A:'):
-                        answer = line[2:].strip()
-                    elif question and not answer and line:
-                        question += " " + line
-                    elif answer and line and not line.startswith('Q:'):
-                        answer += " " + line
-                
-                if question and answer:
-                    question = re.sub(r'\s+', ' ', question).strip()
-                    answer = re.sub(r'\s+', ' ', answer).strip()
-                    question = re.sub(r'^\d+\.\s*', '', question)
-                    
-                    if (len(question) > 5 and len(answer) > 5 and 
-                        len(question) < 300 and len(answer) < 500):
-                        flashcards.append({
-                            "question": question,
-                            "answer": answer
-                        })
-            
-            # Fallback parsing if we got too few cards
-            if len(flashcards) < 3:
-                flashcards = self._fallback_parse(content)
-            
-            return flashcards
-            
+            with timed("parse"):
+                return parse_flashcards(content)
         except Exception as e:
             print(f"Error parsing flashcards: {e}")
             return []
 
     def _fallback_parse(self, content: str) -> List[Dict[str, str]]:
         """Fallback parsing method."""
-        flashcards = []
-        
-        q_pattern = r'Q\d*[:.]?\s*([^QA]+?)(?=A\d*[:.])'
-        a_pattern = r'A\d*[:.]?\s*([^QA]+?)(?=Q\d*[:.}]|$)'
-        
-        questions = re.findall(q_pattern, content, re.DOTALL | re.IGNORECASE)
-        answers = re.findall(a_pattern, content, re.DOTALL | re.IGNORECASE)
-        
-        for i in range(min(len(questions), len(answers))):
-            q = re.sub(r'\s+', ' ', questions[i]).strip()
-            a = re.sub(r'\s+', ' ', answers[i]).strip()
-            
-            if len(q) > 5 and len(a) > 5:
-                flashcards.append({
-                    "question": q,
-                    "answer": a
-                })
-        
-        return flashcards
+        return fallback_parse(content)
+
+    def _parse_json_flashcards(self, content: str) -> List[Dict[str, str]]:
+        """Parse a JSON-mode response; malformed JSON counts as no cards."""
+        try:
+            with timed("parse"):
+                return parse_json_flashcards(content)
+        except ValueError as e:
+            print(f"Error parsing JSON flashcards: {e}")
+            return []
 
     def assign_difficulty_levels(self, flashcards: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        """Assign difficulty levels to flashcards."""
+        """Assign difficulty levels to flashcards, scoring the whole deck in one batch."""
         try:
-            for card in flashcards:
-                question = card["question"].lower()
-                answer = card["answer"]
-                
-                difficulty_score = 0
-                
-                if any(word in question for word in ["what is", "define", "who is"]):
-                    difficulty_score += 1
-                elif any(word in question for word in ["explain", "describe", "how"]):
-                    difficulty_score += 2
-                elif any(word in question for word in ["analyze", "compare", "why"]):
-                    difficulty_score += 3
-                
-                word_count = len(answer.split())
-                if word_count > 30:
-                    difficulty_score += 1
-                
-                if difficulty_score <= 2:
-                    difficulty = "Easy"
-                elif difficulty_score <= 3:
-                    difficulty = "Medium"
-                else:
-                    difficulty = "Hard"
-                
-                card["difficulty"] = difficulty
-            
+            with timed("difficulty"):
+                assign_difficulty(flashcards)
             return flashcards
             
         except Exception as e:
@@ -189,4 +665,44 @@ Generate the flashcards now:"""
             for card in flashcards:
                 if "difficulty" not in card:
                     card["difficulty"] = "Medium"
-            return flashcards
\ No newline at end of file
+            return flashcards
+
+
+_agents: Dict[Tuple[str, str, Optional[str]], Agent] = {}
+_agents_lock = threading.Lock()
+
+def resolve_base_url(base_url: Optional[str] = None) -> Optional[str]:
+    """Endpoint the OpenAI client uses: ``base_url``, else OPENAI_BASE_URL, else None for the public API."""
+    return base_url or os.environ.get("OPENAI_BASE_URL") or None
+
+def api_key_id(openai_api_key: str) -> str:
+    """Stable identifier of an API key that does not reveal the key itself."""
+    return hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest()
+
+def get_agent(openai_api_key: str, model: str = DEFAULT_MODEL,
+              base_url: Optional[str] = None) -> Agent:
+    """
+    Return the shared Agent for an API key, model and endpoint, creating it on first use.
+    
+    The registry lives at module level, so every Streamlit session and rerun in
+    the server process reuses the same client and its cached validation.
+    
+    Args:
+        openai_api_key: OpenAI API key
+        model: Chat completion model name
+        base_url: OpenAI-compatible endpoint, defaults to OPENAI_BASE_URL or the public API
+        
+    Returns:
+        Shared Agent instance
+    """
+    if not openai_api_key:
+        raise Exception("API key is required")
+    
+    base_url = resolve_base_url(base_url)
+    key = (api_key_id(openai_api_key), model, base_url)
+    with _agents_lock:
+        agent = _agents.get(key)
+        if agent is None:
+            agent = Agent(openai_api_key, model, base_url=base_url)
+            _agents[key] = agent
+        return agent
@@ -1,14 +1,21 @@
 import streamlit as st
-import PyPDF2
 import io
-from agent import Agent
+import time
+from agent import api_key_id, get_agent
+from deck_store import get_deck_store
+from jobs import generate_deck, get_job_queue
+from metrics import RunMetrics, activate, timed
+from pdf_extractor import extract_pdf_text, get_page_cache, parse_page_range, spool_upload
 from ui import (
-    api_key_input, file_upload, text_input, subject_selection,
-    generation_settings, display_flashcards, download_buttons,
-    display_statistics, show_error_message, show_success_message,
+    api_key_input, file_upload, page_range_input, text_input, subject_selection,
+    generation_settings, display_flashcards, download_buttons, display_statistics,
+    job_progress, metrics_panel, saved_decks, show_error_message, show_success_message,
     show_warning_message, show_info_message
 )
 
+LAZY_PDF_BYTES = 20 * 1024 * 1024  # larger PDFs are streamed page by page into generation
+JOB_POLL_INTERVAL = 1.0  # seconds between reruns while a generation job is running
+
 def main():
     """Main application function."""
     # Page configuration
@@ -29,9 +36,10 @@ def main():
         show_warning_message("Please enter your OpenAI API key in the sidebar to continue.")
         return
     
-    # Initialize agent
+    # Reuse the shared agent; the connection test only reruns once its TTL expires
     try:
-        agent = Agent(api_key)
+        agent = get_agent(api_key)
+        agent.validate()
     except Exception as e:
         show_error_message(f"Failed to initialize AI agent: {str(e)}")
         return
@@ -42,6 +50,21 @@ def main():
     # Get subject selection
     subject = subject_selection()
     
+    # Reopen a previously generated deck; decks are scoped to the API key
+    store = get_deck_store()
+    owner = api_key_id(api_key)
+    opened = saved_decks(store, owner)
+    if opened is not None:
+        show_deck(opened)
+        st.session_state.pop("settings", None)
+    
+    # Timings of this rerun; they are logged as a run only if it generates a deck
+    metrics_slot = st.sidebar.empty()
+    with metrics_slot.container():
+        metrics_panel(st.session_state.get("last_run"))
+    run = RunMetrics("Pasted text")
+    generated = False
+    
     # Input section
     st.header("📝 Input Your Educational Content")
     
@@ -53,70 +76,113 @@ def main():
     )
     
     text_content = ""
+    large_pdf = None
+    page_numbers = None
+    deck_name = "Pasted text"
     
     if input_method == "📁 File Upload":
         uploaded_file = file_upload()
         if uploaded_file is not None:
-            text_content = process_uploaded_file(uploaded_file)
+            deck_name = uploaded_file.name
+            if uploaded_file.type == "application/pdf":
+                page_spec = page_range_input()
+                if page_spec:
+                    try:
+                        page_numbers = parse_page_range(page_spec)
+                    except ValueError as e:
+                        show_error_message(f"{str(e)}. Using all pages instead.")
+            
+            if uploaded_file.type == "application/pdf" and uploaded_file.size > LAZY_PDF_BYTES:
+                large_pdf = uploaded_file
+                show_info_message("Large PDF: pages will be read and sent for generation as they are extracted.")
+            else:
+                with activate(run):
+                    text_content = process_uploaded_file(uploaded_file, page_numbers)
     else:
         text_content = text_input()
     
-    # Generate flashcards
-    if st.button("🚀 Generate Flashcards", type="primary", use_container_width=True):
-        if not text_content or not text_content.strip():
-            show_error_message("Please provide educational content to generate flashcards.")
-            return
-        
-        # Validate content length
-        if len(text_content.strip()) < 50:
-            show_warning_message("Content seems too short. Please provide more detailed educational material.")
-            return
-        
-        # Generate flashcards
-        with st.spinner("🔄 Generating flashcards... This may take a moment."):
-            try:
-                flashcards = agent.generate_flashcards(text_content, subject)
-                
-                if not flashcards:
-                    show_error_message("Failed to generate flashcards. Please try again with different content.")
-                    return
-                
-                # Assign difficulty levels if enabled
-                if settings.get("auto_difficulty", True):
-                    flashcards = agent.assign_difficulty_levels(flashcards)
-                
-                # Store in session state
-                st.session_state.flashcards = flashcards
-                st.session_state.settings = settings
-                
-                show_success_message(f"Successfully generated {len(flashcards)} flashcards!")
+    # Generate flashcards in the background; this script only polls the job
+    queue = get_job_queue()
+    job = queue.get(st.session_state.get("job_id", ""))
+    if st.button("🚀 Generate Flashcards", type="primary", use_container_width=True,
+                 disabled=job is not None and job.active):
+        if large_pdf is None:
+            if not text_content or not text_content.strip():
+                show_error_message("Please provide educational content to generate flashcards.")
+                return
                 
-            except Exception as e:
-                show_error_message(f"Error generating flashcards: {str(e)}")
+            # Validate content length
+            if len(text_content.strip()) < 50:
+                show_warning_message("Content seems too short. Please provide more detailed educational material.")
                 return
+        
+        run.label = deck_name
+        # The job owns its copy of the upload and deletes it when it is over
+        pdf_path = spool_upload(large_pdf) if large_pdf is not None else None
+        job = queue.submit(
+            deck_name,
+            lambda job: generate_deck(job, agent, store, subject, settings, text_content, pdf_path,
+                                      page_numbers, owner),
+            run=run,
+            files=[pdf_path] if pdf_path else None
+        )
+        st.session_state.job_id = job.id
+        st.session_state.job_settings = settings
+    
+    if job is not None:
+        snapshot = job.snapshot()
+        if job.active:
+            job_progress(snapshot, st.session_state.get("job_settings", settings).get("stream", True), job.cancel)
+        else:
+            del st.session_state.job_id
+            for message in snapshot["messages"]:
+                show_info_message(message)
+            if snapshot["status"] == "done":
+                show_deck(snapshot["result"])
+                st.session_state.settings = st.session_state.pop("job_settings", settings)
+                run = job.run
+                generated = True
+                deck = store.get_deck(snapshot["result"])
+                show_success_message(f"Successfully generated {deck['card_count'] if deck else 0} flashcards!")
+            else:
+                # The worker already logged the failed run
+                finish_run(job.run)
+                with metrics_slot.container():
+                    metrics_panel(st.session_state.last_run)
+                if snapshot["status"] == "cancelled":
+                    show_info_message("Generation was cancelled.")
+                else:
+                    show_error_message(f"Error generating flashcards: {snapshot['error']}")
     
     # Display flashcards if they exist
-    if 'flashcards' in st.session_state and st.session_state.flashcards:
-        flashcards = st.session_state.flashcards
+    deck_id = st.session_state.get("deck_id")
+    if deck_id is not None and store.get_deck(deck_id) is not None:
         stored_settings = st.session_state.get('settings', settings)
         
-        # Display flashcards
-        display_flashcards(flashcards, stored_settings)
-        
-        # Show statistics
-        display_statistics(flashcards)
-        
-        # Download options
-        download_buttons(flashcards)
+        with activate(run), timed("render"):
+            # Display flashcards
+            display_flashcards(store, deck_id, stored_settings)
+            
+            # Show statistics
+            display_statistics(store, deck_id)
+            
+            # Download options
+            download_buttons(store, deck_id)
         
         # Option to clear flashcards
         if st.button("🗑️ Clear Flashcards", type="secondary"):
-            if 'flashcards' in st.session_state:
-                del st.session_state.flashcards
+            store.delete_deck(deck_id, owner)
+            del st.session_state.deck_id
+            st.session_state.pop("exports", None)
             if 'settings' in st.session_state:
                 del st.session_state.settings
             st.rerun()
     
+    if generated:
+        finish_run(run)
+        with metrics_slot.container():
+            metrics_panel(st.session_state.last_run)
+    
     # Footer
     st.markdown("---")
     st.markdown("💡 **Tips for better flashcards:**")
@@ -126,13 +192,44 @@ def main():
     - Select the appropriate subject for optimized generation
     - Use content with sufficient detail (at least 100+ words)
     """)
+    
+    # Poll a running job; widgets stay usable between reruns
+    if job is not None and job.active:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
+def finish_run(run: RunMetrics, error=None):
+    """
+    Log a generation run and keep its summary for the metrics panel.
+    
+    Args:
+        run: Metrics of the run
+        error: Why the run failed, if it did
+    """
+    st.session_state.last_run = run.finish(error=error)
+    st.session_state.pop("run_history", None)
+
+def show_deck(deck_id: int):
+    """
+    Make a stored deck the one on display, starting from its first card.
+    
+    Args:
+        deck_id: Deck to display
+    """
+    st.session_state.deck_id = deck_id
+    st.session_state.pop("card_search", None)
+    st.session_state.pop("exports", None)
+    for prefix in ("card", "table"):
+        st.session_state[f"{prefix}_offset"] = 0
+        st.session_state.pop(f"{prefix}_jump", None)
 
-def process_uploaded_file(uploaded_file) -> str:
+def process_uploaded_file(uploaded_file, page_numbers=None) -> str:
     """
     Process uploaded file and extract text content.
     
     Args:
         uploaded_file: Streamlit uploaded file object
+        page_numbers: Optional 1-based PDF pages to keep
         
     Returns:
         Extracted text content
@@ -144,7 +241,8 @@ def process_uploaded_file(uploaded_file) -> str:
             
         elif uploaded_file.type == "application/pdf":
             # Handle PDF files
-            text_content = extract_text_from_pdf(uploaded_file)
+            text_content = extract_text_from_pdf(uploaded_file, page_numbers)
+            st.caption(f"PDF extraction cache hit rate: {get_page_cache().stats()['hit_rate']:.0%}")
             
         else:
             show_error_message(f"Unsupported file type: {uploaded_file.type}")
@@ -171,37 +269,32 @@ def process_uploaded_file(uploaded_file) -> str:
         show_error_message(f"Error processing file: {str(e)}")
         return ""
 
-def extract_text_from_pdf(pdf_file) -> str:
+def extract_text_from_pdf(pdf_file, page_numbers=None) -> str:
     """
     Extract text from PDF file.
     
+    Pages are cached by file content hash, so reruns and re-uploads of the
+    same file skip PDF parsing entirely.
+    
     Args:
         pdf_file: Uploaded PDF file object
+        page_numbers: Optional 1-based pages to keep
         
     Returns:
         Extracted text content
     """
     try:
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        data = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+        text, errors = extract_pdf_text(data, page_numbers)
         
-        # Extract text from all pages
-        text = ""
-        for page_num, page in enumerate(pdf_reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text += f"\n--- Page {page_num + 1} ---\n"
-                    text += page_text + "\n"
-            except Exception as e:
-                show_warning_message(f"Could not extract text from page {page_num + 1}: {str(e)}")
-                continue
+        for page_number, error in errors:
+            show_warning_message(f"Could not extract text from page {page_number}: {error}")
         
-        if not text.strip():
+        if not text:
             show_error_message("No text could be extracted from the PDF. The file might contain only images or be corrupted.")
             return ""
         
-        return text.strip()
+        return text
         
     except Exception as e:
         show_error_message(f"Error reading PDF file: {str(e)}")
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark for batch difficulty scoring.
+
+Times difficulty.assign_difficulty against the previous per-card keyword scan
+on a large synthetic deck and checks that both assign identical labels,
+including on random questions that mix and overlap the keywords.
+
+Usage:
+    python benchmarks/bench_difficulty.py [--cards 100000] [--repeat 5] [--fuzz 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from difficulty import assign_difficulty  # noqa: E402
+
+
+def legacy_assign(flashcards: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """The per-card scoring as it was before difficulty.py, kept as the reference output."""
+    for card in flashcards:
+        question = card["question"].lower()
+        answer = card["answer"]
+
+        difficulty_score = 0
+
+        if any(word in question for word in ["what is", "define", "who is"]):
+            difficulty_score += 1
+        elif any(word in question for word in ["explain", "describe", "how"]):
+            difficulty_score += 2
+        elif any(word in question for word in ["analyze", "compare", "why"]):
+            difficulty_score += 3
+
+        word_count = len(answer.split())
+        if word_count > 30:
+            difficulty_score += 1
+
+        if difficulty_score <= 2:
+            difficulty = "Easy"
+        elif difficulty_score <= 3:
+            difficulty = "Medium"
+        else:
+            difficulty = "Hard"
+
+        card["difficulty"] = difficulty
+
+    return flashcards
+
+
+STARTS = ["What is", "Define", "Who is", "Explain", "Describe", "How does",
+          "Analyze", "Compare", "Why does", "Name", "List", "When did"]
+WORDS = ("cell membrane protein energy light reaction enzyme osmosis gradient "
+         "nucleus transport diffusion molecule structure function tissue").split()
+
+
+def synthetic_deck(cards: int, rng: random.Random) -> List[Dict[str, str]]:
+    deck = []
+    for _ in range(cards):
+        question = f"{rng.choice(STARTS)} {' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))}?"
+        answer = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 45)))
+        deck.append({"question": question, "answer": answer})
+    return deck
+
+
+def fuzz_card(rng: random.Random) -> Dict[str, str]:
+    alphabet = ["what is", "WHAT IS", "define", "who is", "explain", "describe", "how",
+                "analyze", "compare", "why", "sho", "w", "wh", "at is", "\x00", "İ",
+                " ", " ", "\n", "x", "?", "showhat is", "ho", "whyho"]
+    question = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+    answer = " ".join("w" for _ in range(rng.randint(25, 35)))
+    return {"question": question, "answer": answer}
+
+
+def best_time(assign: Callable[[list], list], deck: List[Dict[str, str]], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        cards = [dict(card) for card in deck]
+        start = time.perf_counter()
+        assign(cards)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000, help="cards in the synthetic deck")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions, best is reported")
+    parser.add_argument("--fuzz", type=int, default=20000, help="random cards to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    fuzz = [fuzz_card(rng) for _ in range(args.fuzz)]
+    expected = legacy_assign([dict(card) for card in fuzz])
+    actual = assign_difficulty([dict(card) for card in fuzz])
+    for want, got in zip(expected, actual):
+        if want != got:
+            sys.exit(f"Label differs from the reference for {want!r}: {got['difficulty']}")
+    print(f"fuzz: {args.fuzz} random cards labelled identically")
+
+    deck = synthetic_deck(args.cards, rng)
+    if legacy_assign([dict(card) for card in deck]) != assign_difficulty([dict(card) for card in deck]):
+        sys.exit("synthetic deck: labels differ from the reference")
+
+    legacy = best_time(legacy_assign, deck, args.repeat)
+    current = best_time(assign_difficulty, deck, args.repeat)
+    print(f"{len(deck)} cards  legacy {legacy * 1000:.1f} ms  current {current * 1000:.1f} ms  "
+          f"({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
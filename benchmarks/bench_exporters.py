@@ -0,0 +1,134 @@
+"""
+Micro-benchmark for the deck exporters.
+
+Times the streaming csv-module/generator writers in exporters.py against the
+previous pandas and json.dumps implementations, reports peak memory of both,
+and checks that every format is byte-identical on random decks with quotes,
+separators, newlines, missing keys and non-ASCII text.
+
+Usage:
+    python benchmarks/bench_exporters.py [--cards 100000] [--repeat 3] [--fuzz 500]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporters import create_anki_format, create_csv, create_json, iter_export  # noqa: E402
+
+
+def legacy_csv(flashcards: List[Dict[str, str]]) -> str:
+    """The exporters as they were before streaming writers, kept as the reference output."""
+    df = pd.DataFrame(flashcards)
+    return df.to_csv(index=False)
+
+
+def legacy_json(flashcards: List[Dict[str, str]]) -> str:
+    return json.dumps(flashcards, indent=2, ensure_ascii=False)
+
+
+def legacy_anki(flashcards: List[Dict[str, str]]) -> str:
+    anki_lines = []
+    for card in flashcards:
+        question = card["question"].replace("\n", "<br>")
+        answer = card["answer"].replace("\n", "<br>")
+        difficulty = card.get("difficulty", "Medium")
+        anki_lines.append(f"{question}\t{answer}\t{difficulty}")
+    return "\n".join(anki_lines)
+
+
+FORMATS: List[Tuple[str, Callable, Callable]] = [
+    ("csv", legacy_csv, create_csv),
+    ("json", legacy_json, create_json),
+    ("anki", legacy_anki, create_anki_format),
+]
+
+
+def fuzz_text(rng: random.Random) -> str:
+    alphabet = ["a", "b", " ", ",", '"', "\n", "\r", "\t", ";", "'", "é", "漢", "😀", "\\", "<br>", ""]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+
+
+def fuzz_deck(rng: random.Random) -> List[Dict[str, str]]:
+    deck = []
+    for _ in range(rng.randint(0, 6)):
+        card = {"question": fuzz_text(rng), "answer": fuzz_text(rng)}
+        if rng.random() < 0.7:
+            card["difficulty"] = rng.choice(["Easy", "Medium", "Hard", ""])
+        if rng.random() < 0.1:
+            card["source"] = fuzz_text(rng)
+        deck.append(card)
+    return deck
+
+
+def synthetic_deck(cards: int, rng: random.Random) -> List[Dict[str, str]]:
+    words = "cell membrane protein, energy \"light\" reaction enzyme osmosis gradient nucleus".split()
+    return [
+        {
+            "question": " ".join(rng.choice(words) for _ in range(rng.randint(4, 12))) + "?",
+            "answer": " ".join(rng.choice(words) for _ in range(rng.randint(8, 40))),
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"])
+        }
+        for _ in range(cards)
+    ]
+
+
+def measure(function: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    """Best wall time over ``repeat`` runs and the peak traced allocation of one run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def drain(iterator) -> int:
+    """Consume a writer the way a file export does, without joining the chunks."""
+    return sum(len(chunk) for chunk in iterator)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000, help="cards in the synthetic deck")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions, best is reported")
+    parser.add_argument("--fuzz", type=int, default=500, help="random decks to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    for _ in range(args.fuzz):
+        deck = fuzz_deck(rng)
+        for name, legacy, current in FORMATS:
+            if name == "anki" and any("question" not in c or "answer" not in c for c in deck):
+                continue
+            if current(deck).encode("utf-8") != legacy(deck).encode("utf-8"):
+                sys.exit(f"{name}: output differs from the reference for {deck!r}")
+    print(f"fuzz: {args.fuzz} random decks exported identically in every format")
+
+    deck = synthetic_deck(args.cards, rng)
+    for name, legacy, current in FORMATS:
+        if current(deck) != legacy(deck):
+            sys.exit(f"{name}: output differs from the reference on the synthetic deck")
+
+        legacy_time, legacy_peak = measure(lambda: legacy(deck), args.repeat)
+        stream_time, stream_peak = measure(lambda: drain(iter_export(deck, name)), args.repeat)
+        print(f"{name}: {len(deck)} cards  legacy {legacy_time * 1000:.0f} ms / {legacy_peak / 2**20:.1f} MiB  "
+              f"streaming {stream_time * 1000:.0f} ms / {stream_peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Import-time benchmark for the app and CLI entry points.
+
+Imports each module in a fresh interpreter under ``python -X importtime`` and
+reports its cumulative import time, the heavy dependencies it loaded and the
+peak memory of the process. With --check it exits non-zero when a module loads
+a dependency that should only be imported at the point of use, so lazy imports
+stay lazy.
+
+Usage:
+    python benchmarks/bench_imports.py [app cli agent] [--repeat 5] [--check]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ["streamlit", "pandas", "numpy", "openai", "httpx", "PyPDF2", "tiktoken"]
+
+# Dependencies each module must not load at import time
+DEFERRED: Dict[str, List[str]] = {
+    "app": ["openai", "httpx", "PyPDF2"],
+    "cli": ["pandas", "streamlit", "openai", "httpx", "PyPDF2"],
+    "agent": ["pandas", "streamlit", "openai", "httpx", "PyPDF2"],
+    "pdf_extractor": ["PyPDF2"],
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PROBE = "import resource, sys; import {module}; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def import_profile(module: str) -> Tuple[Dict[str, int], int]:
+    """
+    Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Tuple of (cumulative microseconds per top-level package imported, peak RSS in KiB)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            name = match.group(4).split(".")[0]
+            # A package's outermost entry is listed last and includes its submodules
+            cumulative[name] = max(cumulative.get(name, 0), int(match.group(2)))
+    return cumulative, int(result.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["app", "cli", "agent"], help="modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module, best is reported")
+    parser.add_argument("--check", action="store_true", help="fail if a deferred dependency is imported")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        best, rss = min(runs, key=lambda run: run[0].get(module, 0))
+        loaded = [f"{name} {best[name] / 1000:.0f} ms" for name in HEAVY if name in best]
+        print(f"{module}: {best.get(module, 0) / 1000:.0f} ms, peak RSS {rss / 1024:.1f} MiB; "
+              f"loaded {', '.join(loaded) or 'no heavy dependencies'}")
+
+        eager = [name for name in DEFERRED.get(module, []) if name in best]
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} at module load")
+
+    if args.check and failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
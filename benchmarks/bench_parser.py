@@ -0,0 +1,155 @@
+"""
+Micro-benchmark for the flashcard response parser.
+
+Times card_parser.parse_flashcards against the previous regex-based parser on
+large synthetic responses and checks that both produce identical cards, including
+on randomly generated malformed responses that exercise the fallback path.
+
+Usage:
+    python benchmarks/bench_parser.py [--cards 5000] [--repeat 5] [--fuzz 2000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_parser import parse_flashcards  # noqa: E402
+
+
+def legacy_parse(content: str) -> List[Dict[str, str]]:
+    """The parser as it was before card_parser.py, kept as the reference output."""
+    flashcards = []
+    sections = re.split(r'\n\s*\n', content.strip())
+
+    for section in sections:
+        section = section.strip()
+        if not section:
+            continue
+
+        lines = section.split('\n')
+        question = ""
+        answer = ""
+
+        for line in lines:
+            line = line.strip()
+            if line.startswith('Q:'):
+                question = line[2:].strip()
+            elif line.startswith('A:'):
+                answer = line[2:].strip()
+            elif question and not answer and line:
+                question += " " + line
+            elif answer and line and not line.startswith('Q:'):
+                answer += " " + line
+
+        if question and answer:
+            question = re.sub(r'\s+', ' ', question).strip()
+            answer = re.sub(r'\s+', ' ', answer).strip()
+            question = re.sub(r'^\d+\.\s*', '', question)
+
+            if (len(question) > 5 and len(answer) > 5 and
+                    len(question) < 300 and len(answer) < 500):
+                flashcards.append({"question": question, "answer": answer})
+
+    if len(flashcards) < 3:
+        flashcards = legacy_fallback_parse(content)
+
+    return flashcards
+
+
+def legacy_fallback_parse(content: str) -> List[Dict[str, str]]:
+    flashcards = []
+
+    q_pattern = r'Q\d*[:.]?\s*([^QA]+?)(?=A\d*[:.])'
+    a_pattern = r'A\d*[:.]?\s*([^QA]+?)(?=Q\d*[:.}]|$)'
+
+    questions = re.findall(q_pattern, content, re.DOTALL | re.IGNORECASE)
+    answers = re.findall(a_pattern, content, re.DOTALL | re.IGNORECASE)
+
+    for i in range(min(len(questions), len(answers))):
+        q = re.sub(r'\s+', ' ', questions[i]).strip()
+        a = re.sub(r'\s+', ' ', answers[i]).strip()
+
+        if len(q) > 5 and len(a) > 5:
+            flashcards.append({"question": q, "answer": a})
+
+    return flashcards
+
+
+WORDS = ("cell membrane protein energy light reaction enzyme osmosis gradient "
+         "nucleus transport diffusion molecule structure function tissue").split()
+
+
+def synthetic_response(cards: int, rng: random.Random) -> str:
+    """A well-formed Q:/A: response with multi-line answers and numbered questions."""
+    blocks = []
+    for i in range(cards):
+        question = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+        answer = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        if i % 7 == 0:
+            answer = answer.replace(" ", "\n", 1)
+        blocks.append(f"Q: {i + 1}. {question}?\nA: {answer}.")
+    return "\n\n".join(blocks)
+
+
+def unstructured_response(cards: int, rng: random.Random) -> str:
+    """A response without blank lines, which only the fallback path can read."""
+    parts = []
+    for i in range(cards):
+        question = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+        answer = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        parts.append(f"Q{i + 1}. {question}? A{i + 1}: {answer}.")
+    return " ".join(parts)
+
+
+def fuzz_response(rng: random.Random) -> str:
+    alphabet = ["Q", "A", "q", "a", ":", ".", "}", "1", "2", " ", " ", "\n", "\n",
+                "\r", "\t", "x", "y", "z", "Q: ", "A: ", "\n\n", "cell ", "Q1. ", "A1: "]
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 120)))
+
+
+def best_time(parse: Callable[[str], list], content: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000, help="cards per synthetic response")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions, best is reported")
+    parser.add_argument("--fuzz", type=int, default=2000, help="random malformed responses to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    for _ in range(args.fuzz):
+        content = fuzz_response(rng)
+        if parse_flashcards(content) != legacy_parse(content):
+            sys.exit(f"Parser output differs from the reference for {content!r}")
+    print(f"fuzz: {args.fuzz} random responses parsed identically")
+
+    for name, content in (("structured", synthetic_response(args.cards, rng)),
+                          ("unstructured", unstructured_response(args.cards, rng))):
+        expected = legacy_parse(content)
+        actual = parse_flashcards(content)
+        if actual != expected:
+            sys.exit(f"{name}: parser output differs from the reference")
+
+        legacy = best_time(legacy_parse, content, args.repeat)
+        current = best_time(parse_flashcards, content, args.repeat)
+        print(f"{name}: {len(actual)} cards from {len(content) / 1024:.0f} KiB  "
+              f"legacy {legacy * 1000:.1f} ms  current {current * 1000:.1f} ms  "
+              f"({legacy / current:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
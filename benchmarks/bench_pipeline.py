@@ -0,0 +1,244 @@
+"""
+End-to-end performance benchmark of the flashcard pipeline.
+
+Times every stage on kebo102.pdf (or another document) without network access:
+PDF extraction (cold and cached), chunking, generation fan-out (threaded and
+async) against the local fake OpenAI server, response parsing, deduplication, difficulty scoring
+and export. Results are written to JSON; when the output file already exists
+the previous run is printed alongside for comparison before it is replaced.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--pdf kebo102.pdf] [--latency 0.2] [--output benchmarks/results/latest.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent import Agent  # noqa: E402
+from cache import DiskCache, ResponseCache  # noqa: E402
+from card_parser import parse_flashcards, parse_json_flashcards  # noqa: E402
+from chunker import chunk_text  # noqa: E402
+from dedup import deduplicate_flashcards  # noqa: E402
+from difficulty import assign_difficulty  # noqa: E402
+from exporters import create_anki_format, create_csv, create_json  # noqa: E402
+from fake_openai import canned_cards, render_content, start_server  # noqa: E402
+from pdf_extractor import PageCache, extract_pages, join_pages  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "latest.json")
+
+
+def best_of(repeat: int, function: Callable[[], object]) -> float:
+    """Fastest wall time of ``repeat`` calls in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def synthetic_deck(cards: int) -> List[Dict[str, str]]:
+    """A deck of canned cards in which every tenth card repeats the one before it."""
+    base = canned_cards(" ".join(f"term{i} concept{i % 97} process{i % 13}" for i in range(2000)), cards)
+    deck = [{"question": card["q"], "answer": card["a"]} for card in base]
+    for i in range(10, cards, 10):
+        deck[i] = dict(deck[i - 1])
+    return deck
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+
+    with open(args.pdf, "rb") as f:
+        data = f.read()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Extraction, with every page parsed and then answered from the page cache
+        uncached = PageCache(DiskCache(os.path.join(directory, "none.sqlite3"), enabled=False), memory_bytes=0)
+        pages: List = []
+
+        def extract_cold():
+            nonlocal pages
+            pages, _ = extract_pages(data, uncached, max_workers=args.extract_workers)
+
+        results["extract_cold"] = {"seconds": best_of(args.repeat, extract_cold), "pages": len(pages)}
+
+        cached = PageCache(DiskCache(os.path.join(directory, "pages.sqlite3")))
+        extract_pages(data, cached)
+        results["extract_cached"] = {
+            "seconds": best_of(args.repeat, lambda: extract_pages(data, cached)),
+            "pages": len(pages)
+        }
+
+        text = join_pages(pages)
+        document = "\n\n".join([text] * args.scale)
+        chunks: List[str] = []
+
+        def chunk():
+            nonlocal chunks
+            chunks = chunk_text(document, args.chunk_tokens)
+
+        results["chunking"] = {
+            "seconds": best_of(args.repeat, chunk),
+            "chunks": len(chunks),
+            "characters": len(document)
+        }
+
+        # Generation fan-out against the fake server, without the response cache
+        server = start_server(latency=args.latency, jitter=args.jitter, cards=args.cards)
+        try:
+            agent = Agent("fake-key", cache=ResponseCache(os.path.join(directory, "r.sqlite3"), enabled=False),
+                          base_url=server.base_url)
+            cards: List[Dict[str, str]] = []
+
+            def generate():
+                nonlocal cards
+                cards = agent.generate_flashcards(
+                    document, chunk_tokens=args.chunk_tokens, max_workers=args.workers, use_cache=False
+                )
+
+            before = server.snapshot()["requests"]
+            seconds = best_of(args.repeat, generate)
+            requests = (server.snapshot()["requests"] - before) / args.repeat
+            results["generation"] = {
+                "seconds": seconds,
+                "requests": requests,
+                "cards": len(cards),
+                "requests_per_second": requests / seconds,
+                "latency": args.latency,
+                "workers": args.workers
+            }
+
+            def generate_async():
+                asyncio.run(agent.agenerate_flashcards(
+                    document, chunk_tokens=args.chunk_tokens, max_concurrency=args.workers, use_cache=False
+                ))
+
+            results["generation_async"] = {
+                "seconds": best_of(args.repeat, generate_async),
+                "requests": requests,
+                "latency": args.latency,
+                "workers": args.workers
+            }
+
+            def first_card():
+                next(iter(agent.stream_flashcards(
+                    document, chunk_tokens=args.chunk_tokens, max_workers=args.workers, use_cache=False
+                )))
+
+            results["time_to_first_card"] = {"seconds": best_of(args.repeat, first_card)}
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # CPU-bound stages on a large synthetic deck
+    deck_cards = canned_cards(document, args.deck_cards)
+    response = render_content(deck_cards, json_mode=False)
+    json_response = render_content(deck_cards, json_mode=True)
+    results["parse_text"] = {
+        "seconds": best_of(args.repeat, lambda: parse_flashcards(response)),
+        "cards": len(parse_flashcards(response))
+    }
+    results["parse_json"] = {
+        "seconds": best_of(args.repeat, lambda: parse_json_flashcards(json_response)),
+        "cards": len(parse_json_flashcards(json_response))
+    }
+
+    deck = synthetic_deck(args.deck_cards)
+    results["dedup"] = {
+        "seconds": best_of(args.repeat, lambda: deduplicate_flashcards(deck)),
+        "cards": len(deck),
+        "dropped": deduplicate_flashcards(deck)[1]
+    }
+    results["difficulty"] = {
+        "seconds": best_of(args.repeat, lambda: assign_difficulty([dict(card) for card in deck])),
+        "cards": len(deck)
+    }
+    assign_difficulty(deck)
+    for name, export in (("export_csv", create_csv), ("export_json", create_json),
+                         ("export_anki", create_anki_format)):
+        results[name] = {"seconds": best_of(args.repeat, lambda: export(deck)), "cards": len(deck)}
+
+    return results
+
+
+def compare(previous: dict, current: dict):
+    """Print each stage's time next to the previous run."""
+    print(f"{'stage':<20} {'previous':>12} {'current':>12} {'change':>8}")
+    for stage, result in current["results"].items():
+        now = result["seconds"]
+        before = previous.get("results", {}).get(stage, {}).get("seconds")
+        if before:
+            print(f"{stage:<20} {before * 1000:>10.1f}ms {now * 1000:>10.1f}ms {(now - before) / before:>+8.1%}")
+        else:
+            print(f"{stage:<20} {'-':>12} {now * 1000:>10.1f}ms {'':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "kebo102.pdf"), help="document to benchmark with")
+    parser.add_argument("--scale", type=int, default=4, help="copies of the document text to generate from")
+    parser.add_argument("--chunk-tokens", type=int, default=1500, help="token budget per chunk")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generation requests")
+    parser.add_argument("--extract-workers", type=int, help="extraction processes, defaults to the CPU count")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake server latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random fake server latency")
+    parser.add_argument("--cards", type=int, default=8, help="cards per fake response")
+    parser.add_argument("--deck-cards", type=int, default=20000, help="cards in the synthetic deck")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions, best is reported")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+    parser.add_argument("--baseline", help="results file to compare with, defaults to the existing output")
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or args.output
+    previous = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            previous = json.load(f)
+
+    current = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": run(args)
+    }
+
+    if previous is not None:
+        print(f"Comparing with {baseline_path} (commit {previous.get('commit')}, {previous.get('timestamp')})")
+        if previous.get("params") != current["params"]:
+            print("Note: the previous run used different parameters")
+        compare(previous, current)
+    else:
+        compare({}, current)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
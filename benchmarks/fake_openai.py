@@ -0,0 +1,293 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions with canned Q:/A: flashcards (or JSON cards
+when response_format is json_object) built from words of the prompt, so runs
+are deterministic for the same input. Latency, streaming speed, server errors
+and rate limiting can be injected to measure the generation pipeline offline.
+GET /stats returns request counters.
+
+Usage:
+    python benchmarks/fake_openai.py --port 8000 --latency 0.5 --rate-limit-rate 0.05
+
+Then point the app or CLI at it, e.g.
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python -m cli docs/ --api-key fake
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+CHARS_PER_TOKEN = 4
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the injection settings and request counters."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, tokens_per_second: float = 0.0, cards: int = 8,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 max_concurrent: Optional[int] = None, retry_after: float = 1.0,
+                 seed: int = 0):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on, 0 picks a free one
+            latency: Seconds before the first byte of every response
+            jitter: Extra uniformly random latency in seconds
+            tokens_per_second: Completion speed, 0 sends the whole response at once
+            cards: Flashcards per response
+            error_rate: Fraction of requests answered with HTTP 500
+            rate_limit_rate: Fraction of requests answered with HTTP 429
+            max_concurrent: Requests above this many in flight are answered with HTTP 429
+            retry_after: Retry-After header of 429 responses, in seconds
+            seed: Seed for injected latency and failures
+        """
+        super().__init__((host, port), FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.cards = cards
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.stats = {
+            "requests": 0, "completed": 0, "errors": 0, "rate_limited": 0,
+            "in_flight": 0, "max_in_flight": 0, "prompt_tokens": 0, "completion_tokens": 0
+        }
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def admit(self) -> Optional[int]:
+        """Count a new request; return an HTTP status to fail it with, if any."""
+        with self._lock:
+            self.stats["requests"] += 1
+            draw = self._random.random()
+            if self.max_concurrent is not None and self.stats["in_flight"] >= self.max_concurrent:
+                status = 429
+            elif draw < self.error_rate:
+                status = 500
+            elif draw < self.error_rate + self.rate_limit_rate:
+                status = 429
+            else:
+                status = None
+
+            if status == 429:
+                self.stats["rate_limited"] += 1
+            elif status == 500:
+                self.stats["errors"] += 1
+            else:
+                self.stats["in_flight"] += 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            return status
+
+    def finish(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            self.stats["completed"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+def canned_cards(prompt: str, count: int) -> List[Dict[str, str]]:
+    """Deterministic flashcards made from words of the prompt."""
+    words = [word.strip(".,;:()\"'") for word in prompt.split()]
+    words = [word for word in words if len(word) > 3] or ["content"]
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    cards = []
+    for i in range(count):
+        topic = " ".join(rng.choice(words) for _ in range(rng.randint(2, 5)))
+        answer = " ".join(rng.choice(words) for _ in range(rng.randint(8, 40)))
+        cards.append({"q": f"What is the role of {topic} (card {i + 1})?", "a": f"{answer.capitalize()}."})
+    return cards
+
+
+def render_content(cards: List[Dict[str, str]], json_mode: bool) -> str:
+    if json_mode:
+        return json.dumps({"cards": cards})
+    return "\n\n".join(f"Q: {card['q']}\nA: {card['a']}" for card in cards)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        status = self.server.admit()
+        if status == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            {"Retry-After": f"{self.server.retry_after:g}"})
+            return
+        if status == 500:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        prompt_tokens = completion_tokens = 0
+        try:
+            messages = request.get("messages", [])
+            prompt = "\n".join(str(message.get("content", "")) for message in messages)
+            json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+            cards = canned_cards(prompt, self.server.cards)
+            content = render_content(cards, json_mode)
+            max_tokens = request.get("max_tokens")
+            if max_tokens:
+                content = content[:max_tokens * CHARS_PER_TOKEN]
+
+            prompt_tokens = -(-len(prompt) // CHARS_PER_TOKEN)
+            completion_tokens = -(-len(content) // CHARS_PER_TOKEN)
+            model = request.get("model", "fake-model")
+
+            time.sleep(self.server.delay())
+            if request.get("stream"):
+                self._stream(content, model)
+            else:
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
+                    }
+                })
+        finally:
+            self.server.finish(prompt_tokens, completion_tokens)
+
+    def _stream(self, content: str, model: str):
+        """Send the content as server-sent events at the configured token rate."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        piece_chars = 4 * CHARS_PER_TOKEN
+        pause = 4 / self.server.tokens_per_second if self.server.tokens_per_second else 0
+        pieces = [content[i:i + piece_chars] for i in range(0, len(content), piece_chars)]
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in pieces] + [{}]
+
+        for index, delta in enumerate(deltas):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": delta,
+                    "finish_reason": "stop" if index == len(deltas) - 1 else None
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if pause and "content" in delta and delta["content"]:
+                time.sleep(pause)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(**options) -> FakeOpenAIServer:
+    """
+    Start a FakeOpenAIServer on a background thread.
+
+    Args:
+        **options: FakeOpenAIServer settings
+
+    Returns:
+        Running server; call shutdown() and server_close() when done
+    """
+    server = FakeOpenAIServer(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="streaming speed, 0 for instant")
+    parser.add_argument("--cards", type=int, default=8, help="flashcards per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HTTP 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of HTTP 429 responses")
+    parser.add_argument("--max-concurrent", type=int, help="answer 429 above this many requests in flight")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second, cards=args.cards,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        max_concurrent=args.max_concurrent, retry_after=args.retry_after, seed=args.seed
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "flashcard_generator")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB per cache file
+TOUCH_INTERVAL = 60  # seconds; LRU timestamps are only rewritten this often so hits stay read-only
+
+class DiskCache:
+    """
+    Persistent key/value cache backed by SQLite.
+
+    The database runs in WAL mode, so several processes (e.g. app replicas) can
+    share one cache directory. Entries are evicted least-recently-used first once
+    the stored values exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        """
+        Args:
+            path: SQLite database file
+            max_bytes: Size budget for stored values before LRU eviction
+            enabled: When False every lookup misses and nothing is stored
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        if self.enabled:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                conn = self._connection()
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+                conn.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Cache disabled, could not open {path}: {e}")
+                self.enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection; sqlite3 connections are not shared."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored value for ``key`` or None on a miss."""
+        if not self.enabled:
+            return None
+
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] > TOUCH_INTERVAL:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Cache read failed: {e}")
+            row = None
+
+        self._count(row is not None)
+        return bytes(row[0]) if row is not None else None
+
+    def set(self, key: str, value: bytes):
+        """Store ``value`` under ``key`` and evict old entries if over budget."""
+        if not self.enabled:
+            return
+
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        if self.enabled:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for this process plus the shared cache size."""
+        entries, size = 0, 0
+        if self.enabled:
+            try:
+                entries, size = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            except sqlite3.Error:
+                pass
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+class MemoryLRU:
+    """Thread-safe in-memory LRU cache with a byte budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+class ResponseCache(DiskCache):
+    """Content-addressed cache of parsed flashcards per generation request."""
+
+    @staticmethod
+    def make_key(text: str, subject: Optional[str], model: str,
+                 temperature: float, prompt_version: int, output_format: str = "text",
+                 base_url: Optional[str] = None) -> str:
+        """Hash everything that influences the model output for one chunk.
+
+        A non-default endpoint is part of the key, so responses from a stand-in
+        server are never served for the real API. Keys for the default endpoint
+        are unchanged.
+        """
+        parts = [text, subject or "", model, temperature, prompt_version, output_format]
+        if base_url:
+            parts.append(base_url)
+        payload = json.dumps(parts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_cards(self, key: str) -> Optional[list]:
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_cards(self, key: str, cards: list):
+        self.set(key, json.dumps(cards, ensure_ascii=False).encode("utf-8"))
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache.
+
+    Configured through FLASHCARD_CACHE_DIR, FLASHCARD_CACHE_MAX_MB and
+    FLASHCARD_CACHE_DISABLED environment variables.
+
+    Returns:
+        Shared ResponseCache instance
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            directory = os.environ.get("FLASHCARD_CACHE_DIR", DEFAULT_CACHE_DIR)
+            max_mb = float(os.environ.get("FLASHCARD_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024)))
+            disabled = os.environ.get("FLASHCARD_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+            _response_cache = ResponseCache(
+                os.path.join(directory, "responses.sqlite3"),
+                max_bytes=int(max_mb * 1024 * 1024),
+                enabled=not disabled
+            )
+        return _response_cache
@@ -0,0 +1,273 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+from metrics import increment
+
+_NUMBER_PREFIX = re.compile(r'\d+\.\s*')
+_QA_LETTERS = re.compile(r'[QAqa]')
+
+def make_card(question: str, answer: str) -> Optional[Dict[str, str]]:
+    """Normalize a parsed question/answer pair, or return None if it is unusable."""
+    if not (question and answer):
+        return None
+    
+    question = " ".join(question.split())
+    answer = " ".join(answer.split())
+    prefix = _NUMBER_PREFIX.match(question)
+    if prefix:
+        question = question[prefix.end():]
+    
+    if (len(question) > 5 and len(answer) > 5 and 
+        len(question) < 300 and len(answer) < 500):
+        return {
+            "question": question,
+            "answer": answer
+        }
+    return None
+
+def parse_flashcards(content: str) -> List[Dict[str, str]]:
+    """
+    Parse a Q:/A: response into flashcards in a single pass over its lines.
+    
+    Blank lines separate cards. Within a card, text after "Q:" or "A:" continues
+    over the following lines until the next marker. When fewer than three cards
+    are found the response is re-read with fallback_parse, which accepts looser
+    markers such as "Q1." and cards without blank lines between them.
+    
+    Args:
+        content: Raw completion text
+        
+    Returns:
+        List of flashcard dictionaries
+    """
+    flashcards = []
+    question = ""
+    answer = ""
+    
+    for line in content.strip().split('\n'):
+        line = line.strip()
+        
+        if not line:
+            card = make_card(question, answer)
+            if card:
+                flashcards.append(card)
+            question = ""
+            answer = ""
+        elif line.startswith('Q:'):
+            question = line[2:].strip()
+        elif line.startswith('A:'):
+            answer = line[2:].strip()
+        elif question and not answer:
+            question += " " + line
+        elif answer and not line.startswith('Q:'):
+            answer += " " + line
+    
+    card = make_card(question, answer)
+    if card:
+        flashcards.append(card)
+    
+    if len(flashcards) < 3:
+        increment("parse_fallbacks")
+        return fallback_parse(content)
+    
+    return flashcards
+
+def fallback_parse(content: str) -> List[Dict[str, str]]:
+    """
+    Pair up loosely marked questions and answers ("Q1.", "a:", ...) anywhere in the text.
+    
+    A question runs from a Q marker up to the next A marker and an answer from an
+    A marker up to the next Q marker or the end of the text; neither may contain
+    the letters Q or A. The scan visits each Q/A letter once, so it is linear in
+    the length of the response.
+    
+    Args:
+        content: Raw completion text
+        
+    Returns:
+        List of flashcard dictionaries
+    """
+    letters = [match.start() for match in _QA_LETTERS.finditer(content)]
+    questions = _scan_marked_spans(content, letters, "Qq", "Aa", ":.", to_end=False)
+    answers = _scan_marked_spans(content, letters, "Aa", "Qq", ":.}", to_end=True)
+    
+    flashcards = []
+    for question, answer in zip(questions, answers):
+        q = " ".join(question.split())
+        a = " ".join(answer.split())
+        
+        if len(q) > 5 and len(a) > 5:
+            flashcards.append({
+                "question": q,
+                "answer": a
+            })
+    
+    return flashcards
+
+def parse_json_flashcards(content: str) -> List[Dict[str, str]]:
+    """
+    Parse a structured-output response with a single json.loads.
+    
+    The expected schema is {"cards": [{"q": str, "a": str}, ...]}; "question" and
+    "answer" keys and a bare list of cards are accepted too. Entries that do not
+    match the schema are skipped, and cards are normalized like make_card does.
+    
+    Args:
+        content: Raw completion text
+        
+    Returns:
+        List of flashcard dictionaries
+        
+    Raises:
+        ValueError: If the response is not JSON or has no list of cards
+    """
+    data = json.loads(content)
+    items = data.get("cards") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Response does not contain a list of cards")
+    
+    flashcards = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        question = item.get("q", item.get("question"))
+        answer = item.get("a", item.get("answer"))
+        if isinstance(question, str) and isinstance(answer, str):
+            card = make_card(question, answer)
+            if card:
+                flashcards.append(card)
+    
+    return flashcards
+
+def _scan_marked_spans(content: str, letters: List[int], start_letters: str,
+                       stop_letters: str, stop_marks: str, to_end: bool) -> List[str]:
+    """
+    Collect the text following each start marker up to the next stop marker.
+    
+    A marker is a letter followed by optional digits and one of ``stop_marks``
+    (for stop markers) or an optional ":"/"." (for start markers). Spans cannot
+    contain Q or A, so a span always ends at the next Q/A letter, or at the end
+    of the text when ``to_end`` is set. The leading marker digits, punctuation
+    and whitespace are skipped, but a span always keeps at least one character.
+    Matches do not overlap.
+    """
+    n = len(content)
+    spans = []
+    cursor = 0
+    
+    for index, start in enumerate(letters):
+        if start < cursor or content[start] not in start_letters:
+            continue
+        
+        stop = letters[index + 1] if index + 1 < len(letters) else n
+        if stop < n:
+            if content[stop] not in stop_letters or not _has_marker(content, stop, stop_marks):
+                continue
+            ends = [stop]
+        elif to_end:
+            # "$" also matches just before a trailing newline
+            ends = [n - 1, n] if content.endswith('\n') else [n]
+        else:
+            continue
+        
+        begin = _skip_marker(content, start + 1)
+        begin = min(begin, ends[-1] - 1)
+        if begin <= start:
+            continue
+        
+        end = next(e for e in ends if e > begin)
+        spans.append(content[begin:end])
+        cursor = end
+    
+    return spans
+
+def _skip_marker(content: str, position: int) -> int:
+    """Skip the digits, optional ':'/'.' and whitespace that follow a marker letter."""
+    n = len(content)
+    while position < n and content[position].isdecimal():
+        position += 1
+    if position < n and content[position] in ":.":
+        position += 1
+    while position < n and content[position].isspace():
+        position += 1
+    return position
+
+def _has_marker(content: str, position: int, marks: str) -> bool:
+    """Check for optional digits and one of ``marks`` after the letter at ``position``."""
+    n = len(content)
+    position += 1
+    while position < n and content[position].isdecimal():
+        position += 1
+    return position < n and content[position] in marks
+
+class StreamingCardParser:
+    """
+    Incremental Q:/A: parser for streamed completions.
+    
+    Feed it text deltas as they arrive; every call returns the cards completed by
+    that delta. A card is complete at a blank line, at the next "Q:" line or when
+    the stream is closed.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self._parts: List[str] = []
+        self._pending = ""
+        self._question = ""
+        self._answer = ""
+    
+    @property
+    def content(self) -> str:
+        """Full text received so far."""
+        return "".join(self._parts)
+    
+    def feed(self, delta: str) -> List[Dict[str, str]]:
+        """Consume a text delta and return any cards it completed."""
+        self._parts.append(delta)
+        self._pending += delta
+        
+        cards = []
+        if "\n" in delta:
+            lines = self._pending.split("\n")
+            self._pending = lines.pop()
+            for line in lines:
+                card = self._process_line(line)
+                if card:
+                    cards.append(card)
+        return cards
+    
+    def close(self) -> List[Dict[str, str]]:
+        """Flush the last partial line and card at the end of the stream."""
+        cards = []
+        for card in (self._process_line(self._pending), self._finish_card()):
+            if card:
+                cards.append(card)
+        self._pending = ""
+        return cards
+    
+    def _process_line(self, line: str) -> Optional[Dict[str, str]]:
+        line = line.strip()
+        if not line:
+            return self._finish_card()
+        
+        card = None
+        if line.startswith('Q:'):
+            if self._answer:
+                card = self._finish_card()
+            self._question = line[2:].strip()
+        elif line.startswith('A:'):
+            self._answer = line[2:].strip()
+        elif self._question and not self._answer:
+            self._question += " " + line
+        elif self._answer:
+            self._answer += " " + line
+        return card
+    
+    def _finish_card(self) -> Optional[Dict[str, str]]:
+        card = make_card(self._question, self._answer)
+        self._question = ""
+        self._answer = ""
+        if card:
+            self.count += 1
+        return card
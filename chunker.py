@@ -0,0 +1,228 @@
+import re
+import threading
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+CHUNK_TOKENS = 1500  # source tokens per generation request
+OVERLAP_TOKENS = 0  # tokens repeated from the end of the previous chunk
+CHARS_PER_TOKEN = 4  # estimate used when tiktoken is unavailable
+ENCODING_NAME = "cl100k_base"  # tokenizer of the gpt-3.5/gpt-4 model family
+
+_PAGE_MARKER = re.compile(r'--- Page \d+ ---')
+_NUMBERED_HEADING = re.compile(r'(?:chapter|section|unit|part)?\s*\d+(?:\.\d+)*\.?\s+\S', re.IGNORECASE)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_loaded = False
+
+def _get_encoding():
+    """Load the tiktoken encoding once; None when tiktoken or its data is unavailable."""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception as e:
+                print(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding = None
+        return _encoding
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken, or estimate them at four characters per token.
+
+    tiktoken loads its BPE data from TIKTOKEN_CACHE_DIR, so it works offline
+    once that cache has been populated.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def is_heading(line: str) -> bool:
+    """Heuristically detect page markers and section headings in extracted text."""
+    if _PAGE_MARKER.fullmatch(line):
+        return True
+    if len(line) > 80 or line.endswith((".", ",", ";", ":")):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and all(c.isupper() for c in letters)
+
+def split_units(text: str) -> Iterator[str]:
+    """
+    Split text into paragraphs, attaching each heading to the paragraph after it.
+
+    Paragraphs end at blank lines, page markers and headings, so a chunk
+    boundary between units never separates a heading from its content.
+
+    Args:
+        text: Document text, e.g. from extract_text_from_pdf
+
+    Returns:
+        Iterator over units in document order
+    """
+    headings: List[str] = []
+    paragraph: List[str] = []
+
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped and is_heading(stripped):
+            if paragraph:
+                yield "\n".join(paragraph)
+                paragraph = []
+            headings.append(stripped)
+        elif stripped:
+            if headings:
+                paragraph.extend(headings)
+                headings = []
+            paragraph.append(line.rstrip())
+        elif paragraph:
+            yield "\n".join(paragraph)
+            paragraph = []
+
+    if paragraph or headings:
+        yield "\n".join(paragraph + headings)
+
+def _split_oversized(unit: str, max_tokens: int, counter: Callable[[str], int]) -> List[Tuple[str, int]]:
+    """Break a unit that exceeds the budget at sentence, then word boundaries."""
+    pieces: List[Tuple[str, int]] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            pieces.append((" ".join(current), current_tokens))
+        current = []
+        current_tokens = 0
+
+    for sentence in _SENTENCE_END.split(unit):
+        sentence_tokens = counter(sentence)
+        parts = [(sentence, sentence_tokens)]
+        if sentence_tokens > max_tokens:
+            parts = [(word, counter(" " + word)) for word in sentence.split()]
+
+        for part, tokens in parts:
+            # One extra token for the space joining parts
+            if current and current_tokens + tokens + 1 > max_tokens:
+                flush()
+            current_tokens += tokens + 1 if current else tokens
+            current.append(part)
+
+    flush()
+    return pieces
+
+def _tail(text: str, overlap_tokens: int, counter: Callable[[str], int]) -> Tuple[str, int]:
+    """Return the trailing whole sentences of ``text`` that fit in ``overlap_tokens``."""
+    sentences = _SENTENCE_END.split(text)
+    kept: List[str] = []
+    tokens = 0
+    for sentence in reversed(sentences):
+        sentence_tokens = counter(sentence)
+        if tokens + sentence_tokens > overlap_tokens:
+            break
+        kept.append(sentence)
+        tokens += sentence_tokens
+    return " ".join(reversed(kept)), tokens
+
+def pack_units(units: Iterable[str], max_tokens: int = CHUNK_TOKENS,
+               overlap_tokens: int = OVERLAP_TOKENS,
+               counter: Callable[[str], int] = count_tokens) -> Iterator[str]:
+    """
+    Greedily pack units into chunks of at most ``max_tokens`` tokens.
+
+    Units are consumed lazily and a chunk is yielded as soon as the next unit
+    would overflow it. Each chunk may start with up to ``overlap_tokens`` of
+    whole sentences from the end of the previous chunk.
+
+    Args:
+        units: Paragraph-level units, e.g. from split_units
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of context carried into the next chunk
+        counter: Token counting function
+
+    Returns:
+        Iterator over chunks
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    chunk: List[str] = []
+    chunk_tokens = 0
+    has_new_content = False
+
+    for unit in units:
+        unit_tokens = counter(unit)
+        pieces = [(unit, unit_tokens)]
+        if unit_tokens > max_tokens:
+            pieces = _split_oversized(unit, max_tokens, counter)
+
+        for piece, tokens in pieces:
+            # One extra token for the paragraph separator
+            if has_new_content and chunk_tokens + tokens + 1 > max_tokens:
+                text = "\n\n".join(chunk)
+                yield text
+
+                chunk = []
+                chunk_tokens = 0
+                has_new_content = False
+                # The tail shrinks, or is dropped, so it still fits with the piece
+                tail_budget = min(overlap_tokens, max_tokens - tokens - 2)
+                if tail_budget > 0:
+                    tail, tail_tokens = _tail(text, tail_budget, counter)
+                    if tail:
+                        chunk = [tail]
+                        chunk_tokens = tail_tokens + 1
+
+            chunk.append(piece)
+            chunk_tokens += tokens + 1
+            has_new_content = True
+
+    if has_new_content:
+        yield "\n\n".join(chunk)
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS,
+               overlap_tokens: int = OVERLAP_TOKENS) -> List[str]:
+    """
+    Split a document into token-budgeted chunks at semantic boundaries.
+
+    Args:
+        text: Full document text
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of context repeated at the start of each chunk
+
+    Returns:
+        List of chunks in document order
+    """
+    return list(pack_units(split_units(text.strip()), max_tokens, overlap_tokens))
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], max_tokens: int = CHUNK_TOKENS,
+                overlap_tokens: int = OVERLAP_TOKENS) -> Iterator[str]:
+    """
+    Lazily turn (page_number, text) pairs into token-budgeted chunks.
+
+    Pages keep their "--- Page N ---" markers and blank pages are skipped. A
+    chunk is yielded as soon as enough pages have been read to fill it.
+
+    Args:
+        pages: Iterable of (page_number, page_text)
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of context repeated at the start of each chunk
+
+    Returns:
+        Iterator over chunks in document order
+    """
+    def units() -> Iterator[str]:
+        for page_number, page_text in pages:
+            if page_text.strip():
+                yield from split_units(f"--- Page {page_number} ---\n{page_text}")
+
+    return pack_units(units(), max_tokens, overlap_tokens)
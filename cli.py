@@ -0,0 +1,328 @@
+"""
+Generate flashcard decks for a batch of documents without the Streamlit UI.
+
+Every .pdf and .txt file found in the given directories, glob patterns or file
+paths is turned into one deck per export format in the output directory.
+Finished documents are recorded in a checkpoint file, so rerunning an
+interrupted batch only processes what is left.
+
+Usage:
+    python -m cli course/ "notes/**/*.txt" --output-dir decks --jobs 4
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from agent import DEFAULT_MODEL, MAX_WORKERS, OUTPUT_FORMATS, get_agent
+from dedup import SIMILARITY_THRESHOLD, deduplicate_flashcards
+from exporters import EXPORT_FORMATS, write_export
+from metrics import RunMetrics, activate, profiling_enabled, timed
+from pdf_extractor import extract_pdf_text, file_hash
+
+DOCUMENT_SUFFIXES = (".pdf", ".txt")
+CHECKPOINT_NAME = ".flashcards_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+def find_documents(inputs: List[str]) -> List[str]:
+    """
+    Expand directories (recursively), glob patterns and file paths into documents.
+
+    Args:
+        inputs: Directories, glob patterns or file paths
+
+    Returns:
+        Absolute paths of .pdf and .txt files, without duplicates, in input order
+    """
+    found: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = []
+            for root, _, files in os.walk(item):
+                matches.extend(os.path.join(root, name) for name in files)
+            matches.sort()
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            matches = [item]
+
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(DOCUMENT_SUFFIXES):
+                found.append(os.path.abspath(path))
+
+    return list(dict.fromkeys(found))
+
+def output_stems(documents: List[str]) -> Dict[str, str]:
+    """Name each deck after its document, disambiguating documents with the same name."""
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in documents}
+    counts: Dict[str, int] = {}
+    for stem in stems.values():
+        counts[stem] = counts.get(stem, 0) + 1
+    return {
+        path: stem if counts[stem] == 1 else f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        for path, stem in stems.items()
+    }
+
+class Checkpoint:
+    """
+    JSON record of finished documents, rewritten atomically after each one.
+
+    A document counts as finished when its content hash and the generation
+    settings match the recorded entry and all of its deck files still exist.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, object]):
+        self.path = path
+        self.settings = settings
+        self.documents: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CHECKPOINT_VERSION:
+                    self.documents = data.get("documents", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+
+    def is_done(self, document: str, digest: str) -> bool:
+        entry = self.documents.get(document)
+        return (
+            entry is not None
+            and entry.get("sha256") == digest
+            and entry.get("settings") == self.settings
+            and all(os.path.exists(output) for output in entry.get("outputs", []))
+        )
+
+    def record(self, document: str, digest: str, cards: int, outputs: List[str]):
+        with self._lock:
+            self.documents[document] = {
+                "sha256": digest,
+                "settings": self.settings,
+                "cards": cards,
+                "outputs": outputs
+            }
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"version": CHECKPOINT_VERSION, "documents": self.documents}, f, indent=2)
+            os.replace(temporary, self.path)
+
+def read_document(path: str, data: bytes) -> str:
+    """Return the text of a .txt or .pdf document, warning about unreadable pages."""
+    if path.lower().endswith(".pdf"):
+        text, errors = extract_pdf_text(data)
+        for page_number, error in errors:
+            print(f"{path}: could not extract text from page {page_number}: {error}")
+        return text
+    return data.decode("utf-8")
+
+async def process_document(agent, path: str, data: bytes, stem: str, args) -> Dict[str, object]:
+    """
+    Generate, post-process and export the deck of one document.
+
+    Generation runs on the event loop, so the chunks of all documents being
+    processed share one connection pool; extraction and the CPU-bound steps
+    run in worker threads.
+
+    Returns:
+        Dictionary with the number of cards and the written output paths
+    """
+    text = await asyncio.to_thread(read_document, path, data)
+    if not text.strip():
+        raise Exception("no text content found")
+
+    flashcards = await agent.agenerate_flashcards(
+        text, args.subject,
+        max_concurrency=args.workers,
+        use_cache=not args.no_cache,
+        output_format=args.output_format,
+        max_calls=args.max_calls,
+        token_budget=args.token_budget
+    )
+    return await asyncio.to_thread(finish_deck, agent, flashcards, path, stem, args)
+
+def finish_deck(agent, flashcards: List[Dict[str, str]], path: str, stem: str, args) -> Dict[str, object]:
+    """Deduplicate, rate and export a generated deck."""
+    if not args.keep_duplicates:
+        with timed("dedup"):
+            flashcards, dropped = deduplicate_flashcards(flashcards, args.similarity)
+        if dropped:
+            print(f"{path}: removed {dropped} duplicate flashcards")
+    if not args.no_difficulty:
+        flashcards = agent.assign_difficulty_levels(flashcards)
+
+    outputs = []
+    for export_format in args.formats:
+        output = os.path.join(args.output_dir, stem + EXPORT_FORMATS[export_format])
+        with timed("export"), open(output, "w", encoding="utf-8", newline="") as f:
+            write_export(flashcards, export_format, f)
+        outputs.append(output)
+
+    return {"cards": len(flashcards), "outputs": outputs}
+
+def api_tokens(agent) -> int:
+    """Prompt plus completion tokens the agent has spent so far."""
+    return sum(
+        stats["prompt_tokens"] + stats["completion_tokens"]
+        for stats in agent.format_stats.values()
+    )
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns or .pdf/.txt files")
+    parser.add_argument("-o", "--output-dir", default="decks", help="directory for the decks (default: decks)")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=sorted(EXPORT_FORMATS),
+                        help="export format, repeat for several (default: csv)")
+    parser.add_argument("-s", "--subject", help="subject to optimize the flashcards for")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="documents processed concurrently (default: 2)")
+    parser.add_argument("-w", "--workers", type=int, default=MAX_WORKERS,
+                        help=f"concurrent generation requests per document (default: {MAX_WORKERS})")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"OpenAI model (default: {DEFAULT_MODEL})")
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"),
+                        help="OpenAI-compatible endpoint (default: $OPENAI_BASE_URL or the public API)")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"),
+                        help="OpenAI API key (default: $OPENAI_API_KEY)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="text",
+                        help="model output format: Q:/A: text or structured JSON (default: text)")
+    parser.add_argument("--similarity", type=float, default=SIMILARITY_THRESHOLD,
+                        help=f"duplicate similarity threshold (default: {SIMILARITY_THRESHOLD})")
+    parser.add_argument("--keep-duplicates", action="store_true", help="do not remove duplicate cards")
+    parser.add_argument("--no-difficulty", action="store_true", help="do not assign difficulty levels")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    parser.add_argument("--max-calls", type=int,
+                        help="budget mode: API calls per document, spent on the chunks covering the most key terms")
+    parser.add_argument("--token-budget", type=int,
+                        help="budget mode: source tokens sent per document")
+    parser.add_argument("--checkpoint", help=f"checkpoint file (default: OUTPUT_DIR/{CHECKPOINT_NAME})")
+    parser.add_argument("--force", action="store_true", help="regenerate documents already in the checkpoint")
+    parser.add_argument("--profile", action="store_true", default=profiling_enabled(),
+                        help="profile the batch with cProfile (default: FLASHCARD_PROFILE)")
+
+    args = parser.parse_args(argv)
+    args.formats = list(dict.fromkeys(args.formats or ["csv"]))
+    if not args.api_key:
+        parser.error("an OpenAI API key is required: pass --api-key or set OPENAI_API_KEY")
+    if args.jobs < 1 or args.workers < 1:
+        parser.error("--jobs and --workers must be at least 1")
+    if (args.max_calls is not None and args.max_calls < 1) or (args.token_budget is not None and args.token_budget < 1):
+        parser.error("--max-calls and --token-budget must be at least 1")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the batch and print throughput; returns the process exit code."""
+    args = parse_args(argv)
+
+    documents = find_documents(args.inputs)
+    if not documents:
+        print("No .pdf or .txt documents found.")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    settings = {
+        "subject": args.subject,
+        "model": args.model,
+        "base_url": args.base_url,
+        "output_format": args.output_format,
+        "formats": args.formats,
+        "similarity": None if args.keep_duplicates else args.similarity,
+        "difficulty": not args.no_difficulty,
+        "max_calls": args.max_calls,
+        "token_budget": args.token_budget
+    }
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.output_dir, CHECKPOINT_NAME), settings)
+    stems = output_stems(documents)
+
+    todo = []
+    skipped = 0
+    for path in documents:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = file_hash(data)
+        if not args.force and checkpoint.is_done(path, digest):
+            skipped += 1
+        else:
+            todo.append(path)
+
+    print(f"Found {len(documents)} documents, {skipped} already done, {len(todo)} to process.")
+    if not todo:
+        return 0
+
+    agent = get_agent(args.api_key, args.model, args.base_url)
+    agent.validate()
+
+    processed = 0
+    cards = 0
+    failures = []
+    start = time.perf_counter()
+
+    async def run(path: str, jobs: asyncio.Semaphore) -> Tuple[str, Optional[Dict[str, object]], Optional[Exception]]:
+        async with jobs:
+            # Documents are read again here rather than held in memory since the scan
+            with open(path, "rb") as f:
+                data = f.read()
+            document_run = RunMetrics(path)
+            try:
+                with activate(document_run):
+                    result = await process_document(agent, path, data, stems[path], args)
+            except Exception as e:
+                document_run.finish(error=str(e))
+                return path, None, e
+            result["totals"] = document_run.finish()["totals"]
+            checkpoint.record(path, file_hash(data), result["cards"], result["outputs"])
+            return path, result, None
+
+    async def run_batch():
+        nonlocal processed, cards
+        jobs = asyncio.Semaphore(args.jobs)
+        for finished in asyncio.as_completed([run(path, jobs) for path in todo]):
+            path, result, error = await finished
+            if error is not None:
+                failures.append(path)
+                print(f"[failed] {path}: {error}")
+                continue
+            processed += 1
+            cards += result["cards"]
+            totals = result["totals"]
+            print(
+                f"[{processed + len(failures)}/{len(todo)}] {path}: {result['cards']} cards in "
+                f"{totals['seconds']:.1f}s, {totals['api_calls']} API calls, "
+                f"{totals['prompt_tokens'] + totals['completion_tokens']} tokens"
+            )
+
+    # Per-document runs overlap on the event loop thread, so profiling covers the whole batch
+    batch_run = RunMetrics(f"batch of {len(todo)} documents")
+    if args.profile:
+        batch_run.start_profiler()
+    try:
+        asyncio.run(run_batch())
+    except KeyboardInterrupt:
+        print("Interrupted; finished documents are checkpointed, rerun the same command to resume.")
+        return 130
+    finally:
+        if args.profile:
+            batch_run.finish()
+
+    minutes = max(time.perf_counter() - start, 1e-9) / 60
+    tokens = api_tokens(agent)
+    print(
+        f"Processed {processed} documents ({len(failures)} failed, {skipped} skipped) "
+        f"into {cards} cards in {minutes * 60:.1f}s"
+    )
+    print(
+        f"Throughput: {processed / minutes:.1f} documents/min, "
+        f"{cards / minutes:.1f} cards/min, {tokens / minutes:.0f} tokens/min"
+    )
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_DECK_PATH = os.path.join(os.path.expanduser("~"), ".local", "share", "flashcard_generator", "decks.sqlite3")
+PAGE_SIZE = 50  # cards per query when paging or iterating a deck
+INSERT_BATCH = 5000  # cards per executemany call when saving a deck
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+SEARCH_WEIGHTS = (2.0, 1.0)  # BM25 weights of question and answer matches
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS decks ("
+    "id INTEGER PRIMARY KEY, name TEXT NOT NULL, subject TEXT, source TEXT, owner TEXT, "
+    "created REAL NOT NULL, card_count INTEGER NOT NULL DEFAULT 0, "
+    "question_words INTEGER NOT NULL DEFAULT 0, answer_words INTEGER NOT NULL DEFAULT 0, "
+    "version INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS decks_subject ON decks (subject, created)",
+    "CREATE INDEX IF NOT EXISTS decks_created ON decks (created)",
+    "CREATE TABLE IF NOT EXISTS cards ("
+    "id INTEGER PRIMARY KEY, deck_id INTEGER NOT NULL REFERENCES decks (id) ON DELETE CASCADE, "
+    "position INTEGER NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, difficulty TEXT)",
+    # Paging through a whole deck in order
+    "CREATE UNIQUE INDEX IF NOT EXISTS cards_deck_position ON cards (deck_id, position)",
+    # Counting and paging filtered by difficulty
+    "CREATE INDEX IF NOT EXISTS cards_deck_difficulty ON cards (deck_id, difficulty, position)",
+)
+
+# Inverted index over questions and answers, kept in step with the cards table
+_SEARCH_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5("
+    "question, answer, content='cards', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN "
+    "INSERT INTO cards_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer); END",
+    "CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN "
+    "INSERT INTO cards_fts (cards_fts, rowid, question, answer) "
+    "VALUES ('delete', old.id, old.question, old.answer); END",
+)
+
+_TERM = re.compile(r"\w+")
+
+class DeckStore:
+    """
+    Persistent flashcard decks in SQLite.
+
+    The database runs in WAL mode, so every app worker process can read and
+    write the same store concurrently. Cards are written in bulk batches, as
+    a generation job produces them, and are read back in pages through
+    indexes on (deck, position) and (deck, difficulty, position). Per-deck
+    totals, and a version bumped by every write of cards, are kept on the
+    deck row, so views and statistics never load a whole deck. An FTS5 index over
+    questions and answers is updated by triggers as cards are inserted, and
+    answers BM25-ranked searches. Decks carry an owner, so users sharing the
+    store only list and delete their own.
+    """
+
+    def __init__(self, path: str = DEFAULT_DECK_PATH):
+        """
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.full_text = True
+        self._uri = False
+        self._local = threading.local()
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._initialize()
+        except (OSError, sqlite3.Error) as e:
+            # Keep the app usable: decks then live only as long as this process
+            print(f"Deck store unavailable at {path}, keeping decks in memory: {e}")
+            self.path = f"file:flashcard_decks_{id(self)}?mode=memory&cache=shared"
+            self._uri = True
+            self._local = threading.local()
+            self._keepalive = self._connection()
+            self._initialize()
+
+    def _initialize(self):
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(decks)")}
+        if "owner" not in columns:
+            # Decks saved before owners existed belong to nobody and are no longer listed
+            conn.execute("ALTER TABLE decks ADD COLUMN owner TEXT")
+        if "version" not in columns:
+            conn.execute("ALTER TABLE decks ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS decks_owner ON decks (owner, created)")
+        conn.commit()
+
+        try:
+            indexed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'cards_fts'").fetchone()
+            with conn:
+                for statement in _SEARCH_SCHEMA:
+                    conn.execute(statement)
+                if not indexed:
+                    # Index cards saved before search existed
+                    conn.execute("INSERT INTO cards_fts (cards_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            print(f"SQLite full-text search unavailable, searching without an index: {e}")
+            self.full_text = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection; sqlite3 connections are not shared."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, uri=self._uri)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def create_deck(self, flashcards: List[Dict[str, str]], name: str,
+                    subject: Optional[str] = None, source: Optional[str] = None,
+                    owner: Optional[str] = None) -> int:
+        """
+        Save a deck and all of its cards in one transaction.
+
+        Args:
+            flashcards: List of flashcard dictionaries, in display order
+            name: Deck name shown to the user
+            subject: Subject the deck was generated for
+            source: Where the content came from, e.g. a file name
+            owner: Who may list and delete the deck, e.g. an API key id
+
+        Returns:
+            Id of the new deck
+        """
+        conn = self._connection()
+        with conn:
+            deck_id = conn.execute(
+                "INSERT INTO decks (name, subject, source, owner, created) VALUES (?, ?, ?, ?, ?)",
+                (name, subject, source, owner, time.time())
+            ).lastrowid
+            self._insert_cards(conn, deck_id, flashcards)
+        return deck_id
+
+    def add_cards(self, deck_id: int, flashcards: List[Dict[str, str]]):
+        """
+        Append cards to an existing deck, e.g. as a generation job produces them.
+
+        The search index and the deck totals are updated in the same transaction.
+
+        Args:
+            deck_id: Deck to extend
+            flashcards: List of flashcard dictionaries, in display order
+        """
+        conn = self._connection()
+        with conn:
+            self._insert_cards(conn, deck_id, flashcards)
+
+    def replace_cards(self, deck_id: int, flashcards: List[Dict[str, str]]):
+        """
+        Replace every card of a deck in one transaction, e.g. with the final cards of a job.
+
+        Args:
+            deck_id: Deck to rewrite
+            flashcards: List of flashcard dictionaries, in display order
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cards WHERE deck_id = ?", (deck_id,))
+            conn.execute(
+                "UPDATE decks SET card_count = 0, question_words = 0, answer_words = 0 WHERE id = ?", (deck_id,)
+            )
+            self._insert_cards(conn, deck_id, flashcards)
+
+    def _insert_cards(self, conn: sqlite3.Connection, deck_id: int, flashcards: List[Dict[str, str]]):
+        """Bulk insert cards after the deck's last position and update its totals and version."""
+        question_words = sum(len(card["question"].split()) for card in flashcards)
+        answer_words = sum(len(card["answer"].split()) for card in flashcards)
+
+        # Updating first takes the write lock, so concurrent appends get distinct positions
+        updated = conn.execute(
+            "UPDATE decks SET card_count = card_count + ?, question_words = question_words + ?, "
+            "answer_words = answer_words + ?, version = version + 1 WHERE id = ?",
+            (len(flashcards), question_words, answer_words, deck_id)
+        ).rowcount
+        if not updated:
+            raise Exception(f"Deck {deck_id} does not exist")
+        first = conn.execute("SELECT card_count FROM decks WHERE id = ?", (deck_id,)).fetchone()[0] - len(flashcards)
+
+        for start in range(0, len(flashcards), INSERT_BATCH):
+            conn.executemany(
+                "INSERT INTO cards (deck_id, position, question, answer, difficulty) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (deck_id, position, card["question"], card["answer"], card.get("difficulty"))
+                    for position, card in enumerate(flashcards[start:start + INSERT_BATCH], first + start)
+                )
+            )
+
+    def delete_deck(self, deck_id: int, owner: Optional[str] = None):
+        """Delete a deck and its cards; with an owner, only if the deck belongs to it."""
+        conn = self._connection()
+        with conn:
+            if owner is not None and conn.execute(
+                "SELECT 1 FROM decks WHERE id = ? AND owner = ?", (deck_id, owner)
+            ).fetchone() is None:
+                return
+            conn.execute("DELETE FROM cards WHERE deck_id = ?", (deck_id,))
+            conn.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
+
+    def get_deck(self, deck_id: int) -> Optional[Dict[str, object]]:
+        """Return the deck row with its totals, or None if it does not exist."""
+        row = self._connection().execute("SELECT * FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_decks(self, subject: Optional[str] = None, limit: int = 50,
+                   owner: Optional[str] = None) -> List[Dict[str, object]]:
+        """Return the most recent decks, optionally only those of one subject or one owner."""
+        conditions = []
+        params: list = []
+        if subject:
+            conditions.append("subject = ?")
+            params.append(subject)
+        if owner is not None:
+            conditions.append("owner = ?")
+            params.append(owner)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT * FROM decks {where}ORDER BY created DESC LIMIT ?", (*params, limit)
+        )
+        return [dict(row) for row in rows]
+
+    def _difficulty_filter(self, difficulties: Optional[Sequence[str]]) -> Optional[List[Optional[str]]]:
+        """
+        Normalize a difficulty filter; None means no filtering.
+
+        Cards without a difficulty count as Medium, matching card.get("difficulty", "Medium").
+        """
+        if difficulties is None or set(DIFFICULTIES) <= set(difficulties):
+            return None
+        values: List[Optional[str]] = list(dict.fromkeys(difficulties))
+        if "Medium" in values:
+            values.append(None)
+        return values
+
+    def difficulty_counts(self, deck_id: int) -> Dict[Optional[str], int]:
+        """Count cards per stored difficulty (None for unrated cards) with an index-only scan."""
+        rows = self._connection().execute(
+            "SELECT difficulty, COUNT(*) FROM cards WHERE deck_id = ? GROUP BY difficulty", (deck_id,)
+        )
+        return {difficulty: count for difficulty, count in rows}
+
+    def count_cards(self, deck_id: int, difficulties: Optional[Sequence[str]] = None) -> int:
+        """Number of cards in a deck that pass the difficulty filter."""
+        values = self._difficulty_filter(difficulties)
+        if values is None:
+            deck = self.get_deck(deck_id)
+            return deck["card_count"] if deck else 0
+        counts = self.difficulty_counts(deck_id)
+        return sum(counts.get(difficulty, 0) for difficulty in values)
+
+    def get_cards(self, deck_id: int, difficulties: Optional[Sequence[str]] = None,
+                  offset: int = 0, limit: int = PAGE_SIZE) -> List[Dict[str, str]]:
+        """
+        Return one page of cards in deck order.
+
+        Args:
+            deck_id: Deck to read
+            difficulties: Difficulty levels to include, None for all
+            offset: Number of matching cards to skip
+            limit: Maximum number of cards to return
+
+        Returns:
+            List of flashcard dictionaries
+        """
+        values = self._difficulty_filter(difficulties)
+        conn = self._connection()
+        if values is None:
+            # Positions are dense, so the unfiltered page is a plain range lookup
+            rows = conn.execute(
+                "SELECT question, answer, difficulty FROM cards "
+                "WHERE deck_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (deck_id, offset, limit)
+            )
+        else:
+            condition, levels = _difficulty_condition(values)
+            rows = conn.execute(
+                f"SELECT question, answer, difficulty FROM cards WHERE deck_id = ? AND {condition} "
+                f"ORDER BY position LIMIT ? OFFSET ?",
+                (deck_id, *levels, limit, offset)
+            )
+        return [_card(row) for row in rows]
+
+    def _search_query(self, deck_id: int, query: str,
+                      difficulties: Optional[Sequence[str]]) -> Optional[Tuple[str, list]]:
+        """
+        Build the FROM/WHERE part and parameters of a search, or None if the query has no terms.
+
+        Every term must match, as a prefix, in the question or the answer.
+        """
+        terms = _TERM.findall(query)
+        if not terms:
+            return None
+
+        if self.full_text:
+            # CROSS JOIN keeps the index lookup as the outer loop instead of one MATCH per card
+            sql = ("FROM cards_fts CROSS JOIN cards ON cards.id = cards_fts.rowid "
+                   "WHERE cards_fts MATCH ? AND cards.deck_id = ?")
+            params: list = [" ".join(f'"{term}"*' for term in terms), deck_id]
+        else:
+            sql = "FROM cards WHERE cards.deck_id = ?"
+            params = [deck_id]
+            for term in terms:
+                sql += " AND (question LIKE ? OR answer LIKE ?)"
+                params += [f"%{term}%"] * 2
+
+        values = self._difficulty_filter(difficulties)
+        if values is not None:
+            condition, levels = _difficulty_condition(values)
+            sql += f" AND {condition}"
+            params += levels
+        return sql, params
+
+    def count_matches(self, deck_id: int, query: str, difficulties: Optional[Sequence[str]] = None) -> int:
+        """Number of cards in a deck matching a search that pass the difficulty filter."""
+        search = self._search_query(deck_id, query, difficulties)
+        if search is None:
+            return 0
+        sql, params = search
+        return self._connection().execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+
+    def search_cards(self, deck_id: int, query: str, difficulties: Optional[Sequence[str]] = None,
+                     offset: int = 0, limit: int = PAGE_SIZE) -> List[Tuple[int, Dict[str, str]]]:
+        """
+        Return one page of cards matching a search, best matches first.
+
+        Args:
+            deck_id: Deck to search
+            query: Words to look for; each must start a word of the question or answer
+            difficulties: Difficulty levels to include, None for all
+            offset: Number of matching cards to skip
+            limit: Maximum number of cards to return
+
+        Returns:
+            List of (1-based card number, flashcard dictionary) tuples
+        """
+        search = self._search_query(deck_id, query, difficulties)
+        if search is None:
+            return []
+        sql, params = search
+        if self.full_text:
+            order = f"bm25(cards_fts, {SEARCH_WEIGHTS[0]}, {SEARCH_WEIGHTS[1]})"
+        else:
+            order = "cards.position"
+        rows = self._connection().execute(
+            f"SELECT cards.position, cards.question, cards.answer, cards.difficulty {sql} "
+            f"ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        )
+        return [(row["position"] + 1, _card(row)) for row in rows]
+
+    def iter_cards(self, deck_id: int, batch_size: int = 1000) -> Iterator[Dict[str, str]]:
+        """Yield every card of a deck in order, reading it in batches."""
+        position = 0
+        conn = self._connection()
+        while True:
+            rows = conn.execute(
+                "SELECT position, question, answer, difficulty FROM cards "
+                "WHERE deck_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (deck_id, position, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _card(row)
+            position = rows[-1]["position"] + 1
+
+def _difficulty_condition(values: List[Optional[str]]) -> Tuple[str, List[str]]:
+    """SQL condition and parameters selecting cards of the given difficulties."""
+    levels = [value for value in values if value is not None]
+    condition = f"cards.difficulty IN ({', '.join('?' * len(levels))})"
+    if None in values:
+        condition += " OR cards.difficulty IS NULL"
+    return f"({condition})", levels
+
+def _card(row: sqlite3.Row) -> Dict[str, str]:
+    card = {"question": row["question"], "answer": row["answer"]}
+    if row["difficulty"] is not None:
+        card["difficulty"] = row["difficulty"]
+    return card
+
+_deck_store: Optional[DeckStore] = None
+_deck_store_lock = threading.Lock()
+
+def get_deck_store() -> DeckStore:
+    """
+    Return the process-wide deck store.
+
+    The database location is FLASHCARD_DECK_DB, defaulting to
+    ~/.local/share/flashcard_generator/decks.sqlite3.
+
+    Returns:
+        Shared DeckStore instance
+    """
+    global _deck_store
+    with _deck_store_lock:
+        if _deck_store is None:
+            _deck_store = DeckStore(os.environ.get("FLASHCARD_DECK_DB", DEFAULT_DECK_PATH))
+        return _deck_store
@@ -0,0 +1,167 @@
+import re
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+SIMILARITY_THRESHOLD = 0.8  # Jaccard similarity of word shingles above which cards are duplicates
+NUM_PERM = 64  # MinHash permutations per signature
+SHINGLE_SIZE = 3  # words per shingle
+BLOCK_CARDS = 2048  # cards hashed per NumPy block, bounds peak memory
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SHINGLE_MULTIPLIERS = [np.uint64(m) for m in (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D)[:SHINGLE_SIZE]]
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+def _shingle_hashes(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash the word n-grams of every card in one vectorized pass.
+
+    Cards shorter than SHINGLE_SIZE words get a single shingle of all their words.
+
+    Returns:
+        Tuple of (shingle hashes of all cards concatenated, start offset of each card)
+    """
+    words = [text.split() or [""] for text in texts]
+    lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+    word_hashes = np.fromiter(
+        (hash(word) & 0xFFFFFFFF for card_words in words for word in card_words),
+        dtype=np.uint64, count=int(lengths.sum())
+    )
+
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = np.repeat(starts + lengths, lengths)
+    positions = np.arange(len(word_hashes))
+
+    shingles = np.zeros(len(word_hashes), dtype=np.uint64)
+    for offset, multiplier in enumerate(_SHINGLE_MULTIPLIERS):
+        shifted = np.zeros(len(word_hashes), dtype=np.uint64)
+        shifted[:len(word_hashes) - offset] = word_hashes[offset:]
+        shifted[positions + offset >= ends] = 0
+        shingles += shifted * multiplier
+    shingles &= _MAX_HASH
+
+    short = np.repeat(lengths < SHINGLE_SIZE, lengths)
+    valid = (positions <= ends - SHINGLE_SIZE) | (short & (positions == np.repeat(starts, lengths)))
+    counts = np.maximum(lengths - SHINGLE_SIZE + 1, 1)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return shingles[valid], offsets
+
+def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) for LSH so that pairs at the threshold almost always collide.
+
+    Uses the largest band size whose S-curve midpoint (1/bands)^(1/rows) stays
+    well below the threshold; candidates are verified exactly afterwards.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold * 0.85:
+            best = (bands, rows)
+    return best
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: a fast, well-distributed 64-bit hash (wraps modulo 2**64)."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def _minhash(shingles: np.ndarray, offsets: np.ndarray, num_perm: int, seed: int) -> np.ndarray:
+    """Compute MinHash signatures for all cards, vectorized over blocks of cards."""
+    rng = np.random.default_rng(seed)
+    salts = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+    cards = len(offsets) - 1
+    signatures = np.empty((cards, num_perm), dtype=np.uint64)
+    for start in range(0, cards, BLOCK_CARDS):
+        stop = min(start + BLOCK_CARDS, cards)
+        hashes = shingles[offsets[start]:offsets[stop]]
+        # One salted hash function per permutation
+        permuted = _mix(hashes[:, None] ^ salts[None, :])
+        signatures[start:stop] = np.minimum.reduceat(permuted, offsets[start:stop] - offsets[start], axis=0)
+    return signatures
+
+def deduplicate_flashcards(flashcards: List[Dict[str, str]],
+                           threshold: float = SIMILARITY_THRESHOLD,
+                           num_perm: int = NUM_PERM,
+                           seed: int = 1) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Drop exact and near-duplicate flashcards, keeping the first occurrence.
+
+    Cards are compared on their normalized question and answer text. Exact
+    duplicates are found by hashing; near-duplicates by MinHash signatures and
+    locality-sensitive hashing, so only cards sharing an LSH bucket are compared,
+    and each candidate pair is confirmed with the exact shingle Jaccard
+    similarity. The cost grows roughly linearly with the deck size.
+
+    Args:
+        flashcards: List of flashcard dictionaries
+        threshold: Jaccard similarity at or above which cards are duplicates
+        num_perm: MinHash signature length
+        seed: Seed for the MinHash permutations
+
+    Returns:
+        Tuple of (deduplicated flashcards, number of cards dropped)
+    """
+    if len(flashcards) < 2:
+        return list(flashcards), 0
+
+    texts = [normalize(f"{card['question']} {card['answer']}") for card in flashcards]
+    shingles, offsets = _shingle_hashes(texts)
+
+    bands, rows = _choose_bands(threshold, num_perm)
+    signatures = _minhash(shingles, offsets, bands * rows, seed)
+    # Collapse every band of rows into one 64-bit bucket key per card
+    multipliers = np.arange(1, rows + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    band_keys = (signatures.reshape(len(flashcards), bands, rows) * multipliers).sum(axis=2)
+
+    # Cards that share no bucket with any other card are unique; only the rest
+    # go through the candidate comparison below
+    shared = np.zeros(len(flashcards), dtype=bool)
+    for band in range(bands):
+        _, inverse, counts = np.unique(band_keys[:, band], return_inverse=True, return_counts=True)
+        shared |= counts[inverse] > 1
+    shared_indices = np.flatnonzero(shared)
+    shared_keys = dict(zip(shared_indices.tolist(), band_keys[shared_indices].tolist()))
+
+    shingle_sets: Dict[int, Set[int]] = {}
+    def shingle_set(index: int) -> Set[int]:
+        if index not in shingle_sets:
+            shingle_sets[index] = set(shingles[offsets[index]:offsets[index + 1]].tolist())
+        return shingle_sets[index]
+
+    seen_texts: Set[str] = set()
+    buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+    kept: List[Dict[str, str]] = []
+
+    for index, card in enumerate(flashcards):
+        keys = shared_keys.get(index)
+        if keys is None:
+            kept.append(card)
+            continue
+        if texts[index] in seen_texts:
+            continue
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(buckets[band].get(key, ()))
+        if candidates:
+            own = shingle_set(index)
+            if any(
+                len(own & shingle_set(other)) / len(own | shingle_set(other)) >= threshold
+                for other in candidates
+            ):
+                continue
+
+        seen_texts.add(texts[index])
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(index)
+        kept.append(card)
+
+    return kept, len(flashcards) - len(kept)
@@ -0,0 +1,160 @@
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Question keywords by score, in priority order: a question takes the score of
+# the first class it matches
+KEYWORD_CLASSES: Tuple[Tuple[int, Tuple[str, ...]], ...] = (
+    (1, ("what is", "define", "who is")),
+    (2, ("explain", "describe", "how")),
+    (3, ("analyze", "compare", "why")),
+)
+LONG_ANSWER_WORDS = 30  # answers with more words than this score one extra point
+LABEL_THRESHOLDS: Tuple[Tuple[int, str], ...] = ((2, "Easy"), (3, "Medium"))  # highest score per label
+HARDEST_LABEL = "Hard"
+
+_SEPARATOR = "\x00"  # joins questions so no keyword can match across two cards
+
+Features = Dict[str, np.ndarray]
+ScoringRule = Callable[[Features], np.ndarray]
+
+def keyword_rule(features: Features) -> np.ndarray:
+    """Score of the first keyword class found in the question, 0 if none."""
+    return features["keyword_score"]
+
+def long_answer_rule(features: Features) -> np.ndarray:
+    """One point for answers longer than LONG_ANSWER_WORDS words."""
+    return (features["answer_words"] > LONG_ANSWER_WORDS).astype(np.int64)
+
+DEFAULT_RULES: Tuple[ScoringRule, ...] = (keyword_rule, long_answer_rule)
+
+class DifficultyScorer:
+    """
+    Scores a whole deck of flashcards at once.
+
+    Card features are computed as NumPy arrays in one pass over the deck: the
+    lowercased questions are joined into one string that each keyword is
+    searched in once, and matches are mapped back to cards by offset. Rules
+    map the feature arrays to score arrays, are summed, and the totals are
+    bucketed into labels.
+    """
+
+    def __init__(self, rules: Sequence[ScoringRule] = DEFAULT_RULES,
+                 keyword_classes: Sequence[Tuple[int, Sequence[str]]] = KEYWORD_CLASSES,
+                 thresholds: Sequence[Tuple[int, str]] = LABEL_THRESHOLDS,
+                 hardest_label: str = HARDEST_LABEL):
+        """
+        Args:
+            rules: Functions from the feature arrays to per-card scores
+            keyword_classes: (score, keywords) pairs in priority order
+            thresholds: (highest score, label) pairs in ascending score order
+            hardest_label: Label for scores above the last threshold
+        """
+        self.rules = list(rules)
+        self.class_scores = np.array([0] + [score for score, _ in keyword_classes], dtype=np.int64)
+
+        self.keywords: List[Tuple[str, int]] = []
+        for class_index, (_, keywords) in enumerate(keyword_classes, start=1):
+            self.keywords.extend((keyword.lower(), class_index) for keyword in keywords if keyword)
+
+        self.bounds = np.array([bound for bound, _ in thresholds], dtype=np.int64)
+        self.labels = [label for _, label in thresholds] + [hardest_label]
+
+    def features(self, flashcards: List[Dict[str, str]]) -> Features:
+        """
+        Compute per-card feature arrays.
+
+        Returns:
+            Dictionary with "keyword_score", "answer_words", "question_chars"
+            and "answer_chars" arrays, one entry per card
+        """
+        count = len(flashcards)
+        questions = [card["question"].lower() for card in flashcards]
+        answers = [card["answer"] for card in flashcards]
+
+        question_chars = np.fromiter(map(len, questions), dtype=np.int64, count=count)
+        answer_chars = np.fromiter(map(len, answers), dtype=np.int64, count=count)
+        answer_words = np.fromiter(map(len, map(str.split, answers)), dtype=np.int64, count=count)
+
+        # Lowest matching class index per card; no_match means no keyword found
+        no_match = len(self.class_scores)
+        best_class = np.full(count, no_match, dtype=np.int64)
+        if self.keywords and count:
+            positions, classes = self._find_keywords(_SEPARATOR.join(questions))
+            if len(positions):
+                starts = np.cumsum(question_chars + 1) - question_chars - 1
+                cards = np.searchsorted(starts, positions, side="right") - 1
+                np.minimum.at(best_class, cards, classes)
+        best_class[best_class == no_match] = 0
+
+        return {
+            "keyword_score": self.class_scores[best_class],
+            "answer_words": answer_words,
+            "question_chars": question_chars,
+            "answer_chars": answer_chars
+        }
+
+    def _find_keywords(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Locate every occurrence of every keyword in the joined questions.
+
+        Each keyword is searched for with str.find over the whole deck, so the
+        scan runs in C and only the matches themselves are visited in Python.
+        Overlapping occurrences are all reported.
+
+        Returns:
+            Tuple of (match start offsets, keyword class index of each match)
+        """
+        positions: List[int] = []
+        classes: List[int] = []
+        find = text.find
+        for keyword, class_index in self.keywords:
+            found = len(positions)
+            position = find(keyword)
+            while position != -1:
+                positions.append(position)
+                position = find(keyword, position + 1)
+            classes.extend([class_index] * (len(positions) - found))
+        return np.array(positions, dtype=np.int64), np.array(classes, dtype=np.int64)
+
+    def score(self, flashcards: List[Dict[str, str]]) -> np.ndarray:
+        """Return the summed rule scores of every card."""
+        features = self.features(flashcards)
+        scores = np.zeros(len(flashcards), dtype=np.int64)
+        for rule in self.rules:
+            scores += rule(features)
+        return scores
+
+    def label(self, flashcards: List[Dict[str, str]]) -> List[str]:
+        """Return the difficulty label of every card."""
+        buckets = np.searchsorted(self.bounds, self.score(flashcards), side="left")
+        return [self.labels[bucket] for bucket in buckets.tolist()]
+
+_default_scorer: Optional[DifficultyScorer] = None
+_default_scorer_lock = threading.Lock()
+
+def get_scorer() -> DifficultyScorer:
+    """Return the shared scorer with the default keyword classes and rules."""
+    global _default_scorer
+    with _default_scorer_lock:
+        if _default_scorer is None:
+            _default_scorer = DifficultyScorer()
+        return _default_scorer
+
+def assign_difficulty(flashcards: List[Dict[str, str]],
+                      scorer: Optional[DifficultyScorer] = None) -> List[Dict[str, str]]:
+    """
+    Set the "difficulty" key of every card in place.
+
+    Args:
+        flashcards: List of flashcard dictionaries
+        scorer: Scorer to use, defaults to the shared default scorer
+
+    Returns:
+        The same list of flashcards
+    """
+    scorer = scorer if scorer is not None else get_scorer()
+    for card, difficulty in zip(flashcards, scorer.label(flashcards)):
+        card["difficulty"] = difficulty
+    return flashcards
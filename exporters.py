@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import os
+from typing import Dict, IO, Iterator, List
+
+# File name suffix of each export format, matching the app's download names
+EXPORT_FORMATS: Dict[str, str] = {
+    "csv": ".csv",
+    "json": ".json",
+    "anki": "_anki.txt",
+}
+CHUNK_CHARS = 64 * 1024  # characters buffered before a writer yields
+
+_encode_string = json.encoder.encode_basestring  # C-accelerated, as used by ensure_ascii=False
+
+def _columns(flashcards: List[Dict[str, str]]) -> List[str]:
+    """Union of the card keys in order of first appearance, like pd.DataFrame(records)."""
+    columns: Dict[str, None] = {}
+    for card in flashcards:
+        for key in card:
+            columns.setdefault(key, None)
+    return list(columns)
+
+def iter_csv(flashcards: List[Dict[str, str]]) -> Iterator[str]:
+    """
+    Yield the deck as CSV in chunks of about CHUNK_CHARS characters.
+
+    The output is identical to ``pd.DataFrame(flashcards).to_csv(index=False)``
+    for string-valued cards: the same column order, minimal quoting, os.linesep
+    line endings and empty cells for missing keys.
+
+    Args:
+        flashcards: List of flashcard dictionaries
+
+    Returns:
+        Iterator over text chunks
+    """
+    columns = _columns(flashcards)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=os.linesep)
+    writer.writerow(columns)
+
+    for card in flashcards:
+        writer.writerow(["" if card.get(column) is None else card[column] for column in columns])
+        if buffer.tell() >= CHUNK_CHARS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def iter_json(flashcards: List[Dict[str, str]]) -> Iterator[str]:
+    """
+    Yield the deck as indented JSON, identical to json.dumps(indent=2, ensure_ascii=False).
+
+    json's C encoder is not used when indenting, so string-valued cards are laid
+    out here with its C string escaper; other cards go through json.dumps.
+
+    Args:
+        flashcards: List of flashcard dictionaries
+
+    Returns:
+        Iterator over text chunks
+    """
+    if not flashcards:
+        yield "[]"
+        return
+
+    parts = ["["]
+    size = 0
+    for index, card in enumerate(flashcards):
+        if card and all(type(key) is str and type(value) is str for key, value in card.items()):
+            fields = ",\n    ".join(f"{_encode_string(key)}: {_encode_string(value)}" for key, value in card.items())
+            item = f"{{\n    {fields}\n  }}"
+        else:
+            # Escaped JSON strings contain no raw newlines, so re-indenting is safe
+            item = json.dumps(card, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        parts.append(f"{',' if index else ''}\n  {item}")
+        size += len(item)
+        if size >= CHUNK_CHARS:
+            yield "".join(parts)
+            parts = []
+            size = 0
+    parts.append("\n]")
+    yield "".join(parts)
+
+def iter_anki(flashcards: List[Dict[str, str]]) -> Iterator[str]:
+    """Yield the deck as tab-separated Anki lines, without a trailing newline."""
+    separator = ""
+    for card in flashcards:
+        question = card["question"].replace("\n", "<br>")
+        answer = card["answer"].replace("\n", "<br>")
+        difficulty = card.get("difficulty", "Medium")
+        yield f"{separator}{question}\t{answer}\t{difficulty}"
+        separator = "\n"
+
+_WRITERS = {"csv": iter_csv, "json": iter_json, "anki": iter_anki}
+
+def iter_export(flashcards: List[Dict[str, str]], export_format: str) -> Iterator[str]:
+    """
+    Stream flashcards in one of EXPORT_FORMATS.
+
+    Args:
+        flashcards: List of flashcard dictionaries
+        export_format: "csv", "json" or "anki"
+
+    Returns:
+        Iterator over text chunks
+    """
+    writer = _WRITERS.get(export_format)
+    if writer is None:
+        raise Exception(f"Unsupported export format: {export_format}")
+    return writer(flashcards)
+
+def write_export(flashcards: List[Dict[str, str]], export_format: str, file: IO[str]):
+    """Write an export to an open text file chunk by chunk."""
+    for chunk in iter_export(flashcards, export_format):
+        file.write(chunk)
+
+def export_bytes(flashcards: List[Dict[str, str]], export_format: str) -> bytes:
+    """Encode an export as UTF-8 bytes, e.g. for a download button."""
+    buffer = io.BytesIO()
+    for chunk in iter_export(flashcards, export_format):
+        buffer.write(chunk.encode("utf-8"))
+    return buffer.getvalue()
+
+def export_flashcards(flashcards: List[Dict[str, str]], export_format: str) -> str:
+    """Render flashcards in one of EXPORT_FORMATS as a single string."""
+    return "".join(iter_export(flashcards, export_format))
+
+def create_csv(flashcards: List[Dict[str, str]]) -> str:
+    """Create CSV format data."""
+    return export_flashcards(flashcards, "csv")
+
+def create_json(flashcards: List[Dict[str, str]]) -> str:
+    """Create JSON format data."""
+    return export_flashcards(flashcards, "json")
+
+def create_anki_format(flashcards: List[Dict[str, str]]) -> str:
+    """Create Anki-compatible format."""
+    return export_flashcards(flashcards, "anki")
@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+import threading
+import weakref
+from typing import TYPE_CHECKING, Awaitable, Dict, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import httpx
+
+MAX_CONNECTIONS = 64  # sockets open at once per pool
+MAX_KEEPALIVE_CONNECTIONS = 32  # idle sockets kept for reuse
+KEEPALIVE_EXPIRY = 60.0  # seconds an idle socket is kept
+CONNECT_TIMEOUT = 10.0  # seconds to open a connection
+REQUEST_TIMEOUT = 120.0  # seconds per API call; retries are left to the scheduler
+
+T = TypeVar("T")
+
+_http_client: Optional["httpx.Client"] = None
+# httpx.AsyncClient connections belong to the event loop that opened them, so async pools are per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+def _client_options() -> Dict[str, object]:
+    """Pool limits, timeouts and protocol shared by both clients; httpx is imported on first use."""
+    import httpx
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "http2": http2,
+        "follow_redirects": True
+    }
+
+def get_http_client() -> "httpx.Client":
+    """
+    Return the process-wide HTTP client for blocking API calls.
+
+    The client is thread-safe, keeps connections alive between requests and
+    speaks HTTP/2 when the h2 package is installed, so every Agent and
+    Streamlit session reuses the same warm connections.
+
+    Returns:
+        Shared httpx.Client
+    """
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+            _http_client = httpx.Client(**_client_options())
+        return _http_client
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """
+    Return the HTTP client for async API calls on the running event loop.
+
+    Must be called from a coroutine. All requests made on one loop share a
+    single tuned connection pool.
+
+    Returns:
+        Shared httpx.AsyncClient of the running loop
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            import httpx
+            client = httpx.AsyncClient(**_client_options())
+            _async_clients[loop] = client
+        return client
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Start, once, an event loop on a daemon thread for running coroutines from sync code."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="flashcard-async", daemon=True).start()
+        return _loop
+
+async def _in_context(awaitable: Awaitable[T], context: contextvars.Context) -> T:
+    # The task copies the caller's context, so metrics recorded by the coroutine reach its run
+    return await context.run(asyncio.ensure_future, awaitable)
+
+def run_sync(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine from blocking code, such as the Streamlit script thread.
+
+    Coroutines from every caller share one long-lived background event loop,
+    and with it one connection pool, instead of paying for a new loop and new
+    connections on each asyncio.run().
+
+    Args:
+        awaitable: Coroutine to run
+        timeout: Seconds to wait for the result, None to wait indefinitely
+
+    Returns:
+        The coroutine's result
+    """
+    future = asyncio.run_coroutine_threadsafe(
+        _in_context(awaitable, contextvars.copy_context()), _background_loop()
+    )
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
@@ -0,0 +1,305 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from agent import GenerationCancelled
+from dedup import deduplicate_flashcards
+from deck_store import DeckStore
+from http_pool import run_sync
+from metrics import RunMetrics, activate, profiling_enabled, timed
+from pdf_extractor import iter_pdf_pages
+
+JOB_WORKERS = 2  # generation jobs running at once per server process
+JOB_TTL = 3600  # seconds a finished or abandoned job is kept for polling
+PREVIEW_CARDS = 10  # newest cards included in a snapshot for the preview
+
+# Job states; the last three are final
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class Job:
+    """
+    One background generation: its progress, the cards generated so far and its outcome.
+
+    Workers update a job while the Streamlit script thread reads it on every
+    poll, so all state changes go through the job's lock and readers take a
+    consistent snapshot().
+    """
+
+    def __init__(self, label: str, run: Optional[RunMetrics] = None, files: Optional[List[str]] = None):
+        """
+        Args:
+            label: What is being generated, e.g. a file name
+            run: Metrics collecting the job's timings and API calls
+            files: Temporary files the job owns, deleted once it is over
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.run = run
+        self.files = list(files or [])
+        self.status = QUEUED
+        self.chunks_done = 0
+        self.chunks_total: Optional[int] = None
+        self.cards: List[Dict[str, str]] = []
+        self.result: Optional[int] = None
+        self.error: Optional[str] = None
+        self.messages: List[str] = []
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def progress(self, done: int, total: Optional[int], cards: List[Dict[str, str]]):
+        """Progress callback for the agent: chunks done so far and the cards that just arrived."""
+        with self._lock:
+            self.chunks_done = done
+            self.chunks_total = total
+            self.cards.extend(cards)
+
+    def note(self, message: str):
+        """Keep a message, such as a skipped page, to show once the job is done."""
+        with self._lock:
+            self.messages.append(message)
+
+    def cancel(self):
+        """Ask the job to stop; requests already sent are finished or aborted, the rest are dropped."""
+        self.cancel_event.set()
+        with self._lock:
+            if self.status == QUEUED:
+                self._finish(CANCELLED)
+
+    def _finish(self, status: str, result: Optional[int] = None, error: Optional[str] = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def snapshot(self, recent_cards: int = PREVIEW_CARDS) -> Dict[str, object]:
+        """
+        Copy of the job state for display.
+
+        Args:
+            recent_cards: Newest cards to include; polls never copy the whole deck
+
+        Returns:
+            Dictionary of the job's state
+        """
+        with self._lock:
+            return {
+                "id": self.id,
+                "label": self.label,
+                "status": self.status,
+                "chunks_done": self.chunks_done,
+                "chunks_total": self.chunks_total,
+                "card_count": len(self.cards),
+                "cards": self.cards[-recent_cards:] if recent_cards > 0 else [],
+                "result": self.result,
+                "error": self.error,
+                "messages": list(self.messages),
+                "seconds": (self.finished or time.time()) - self.created
+            }
+
+class JobQueue:
+    """
+    Runs generation jobs on a small thread pool, independent of Streamlit reruns.
+
+    Jobs are kept by id, so a session finds its job again on every rerun and a
+    reconnecting browser can keep polling it. Results are decks in the deck
+    store, which outlive the job itself.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        """
+        Args:
+            max_workers: Jobs running at once; more are queued
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flashcard-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, label: str, work: Callable[[Job], int], run: Optional[RunMetrics] = None,
+               files: Optional[List[str]] = None) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            label: What is being generated, e.g. a file name
+            work: Runs the generation for the job and returns the saved deck id
+            run: Metrics of the job, activated in the worker
+            files: Temporary files handed to the job, such as a spooled upload;
+                they are deleted when the job finishes or is cancelled
+
+        Returns:
+            The queued job
+        """
+        self._prune()
+        job = Job(label, run, files)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def _run(self, job: Job, work: Callable[[Job], int]):
+        try:
+            self._work(job, work)
+        finally:
+            self._remove_files(job)
+
+    def _work(self, job: Job, work: Callable[[Job], int]):
+        with job._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+        if job.run is not None and profiling_enabled():
+            job.run.start_profiler()
+
+        status, result, error = DONE, None, None
+        try:
+            with activate(job.run):
+                result = work(job)
+        except GenerationCancelled:
+            status = CANCELLED
+        except Exception as e:
+            print(f"Job {job.id} ({job.label}) failed: {e}")
+            status, error = FAILED, str(e)
+
+        if job.run is not None:
+            job.run.stop_profiler()
+            # Successful runs are finished by the app once the deck is rendered
+            if status != DONE:
+                job.run.finish(error=error or status)
+        with job._lock:
+            job._finish(status, result, error)
+
+    def _remove_files(self, job: Job):
+        for path in job.files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not remove temporary file {path}: {e}")
+
+    def _prune(self):
+        """Forget jobs that finished, or were started, more than JOB_TTL seconds ago."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if now - (job.finished or job.created) > JOB_TTL and not job.active]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            # Nobody polled the result; still log the run
+            if job.run is not None:
+                job.run.finish(error=job.error)
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the process-wide job queue, shared by all Streamlit sessions.
+
+    Returns:
+        Shared JobQueue
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+def generate_deck(job: Job, agent, store: DeckStore, subject: Optional[str],
+                  settings: Dict[str, object], text: Optional[str] = None,
+                  pdf_path: Optional[str] = None, page_numbers: Optional[List[int]] = None,
+                  owner: Optional[str] = None) -> int:
+    """
+    Generate, clean up and save a deck, reporting progress to a job.
+
+    Args:
+        job: Job receiving progress and messages
+        agent: Agent used for generation
+        store: Deck store the deck is saved to
+        subject: Selected subject or None
+        settings: Generation settings
+        text: Source text
+        pdf_path: PDF read page by page instead of text
+        page_numbers: Optional 1-based PDF pages to keep
+        owner: Owner of the saved deck
+
+    Returns:
+        Id of the saved deck
+    """
+    # The deck exists from the start, so cards are indexed and searchable as chunks finish
+    deck_id = store.create_deck([], job.label, subject, job.label, owner)
+
+    def progress(done: int, total: Optional[int], cards: List[Dict[str, str]]):
+        if cards:
+            store.add_cards(deck_id, cards)
+        job.progress(done, total, cards)
+
+    try:
+        flashcards = _generate_cards(job, agent, subject, settings, text, pdf_path, page_numbers, progress)
+        # Swap in the deduplicated cards, in document order and with their difficulty
+        with timed("save_deck"):
+            store.replace_cards(deck_id, flashcards)
+    except BaseException:
+        store.delete_deck(deck_id)
+        raise
+    return deck_id
+
+def _generate_cards(job: Job, agent, subject: Optional[str], settings: Dict[str, object],
+                    text: Optional[str], pdf_path: Optional[str], page_numbers: Optional[List[int]],
+                    progress: Callable[[int, Optional[int], List[Dict[str, str]]], None]) -> List[Dict[str, str]]:
+    """Generate the cards of a job, then drop duplicates and rate their difficulty."""
+    options = {
+        "use_cache": settings.get("use_cache", True),
+        "output_format": settings.get("output_format", "text"),
+        "max_calls": settings.get("max_calls"),
+        "progress": progress,
+        "cancel": job.cancel_event
+    }
+    if pdf_path:
+        pages = iter_pdf_pages(
+            pdf_path, page_numbers,
+            on_error=lambda page_number, error: job.note(f"Could not extract text from page {page_number}: {error}")
+        )
+        flashcards = agent.generate_flashcards_from_pages(pages, subject, **options)
+    elif settings.get("stream", True):
+        # Cards of the first chunk are parsed out of the response stream as they are written
+        flashcards = list(agent.stream_flashcards(text, subject, **options))
+    else:
+        # Chunks overlap on the shared event loop instead of a thread each
+        flashcards = run_sync(agent.agenerate_flashcards(text, subject, **options))
+
+    if not flashcards:
+        raise Exception("No flashcards were generated")
+
+    # Drop cards repeated across chunks
+    if settings.get("deduplicate", True):
+        with timed("dedup"):
+            flashcards, dropped = deduplicate_flashcards(flashcards, settings.get("similarity_threshold", 0.8))
+        if dropped:
+            job.note(f"Removed {dropped} duplicate flashcards")
+
+    if settings.get("auto_difficulty", True):
+        flashcards = agent.assign_difficulty_levels(flashcards)
+
+    if job.cancel_event.is_set():
+        raise GenerationCancelled("Generation was cancelled")
+    return flashcards
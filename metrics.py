@@ -0,0 +1,302 @@
+import contextvars
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_METRICS_LOG = os.path.join(
+    os.path.expanduser("~"), ".local", "share", "flashcard_generator", "metrics.jsonl"
+)
+PROFILE_TOP = 25  # functions printed from a profile, by cumulative time
+
+# Run collecting metrics in the current context; worker threads get it via contextvars.copy_context()
+_current: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("flashcard_run", default=None)
+_log_lock = threading.Lock()
+
+class RunMetrics:
+    """
+    Timings, API calls and counters of one generation run, e.g. one document.
+
+    Stages are accumulated by name (total seconds and number of times entered),
+    every API call is kept with its latency, retries and token usage, and
+    counters track events such as cache hits and parser fallbacks. Recording
+    is thread-safe, so chunk workers can report into the same run.
+    """
+
+    def __init__(self, label: str):
+        """
+        Args:
+            label: What the run processed, e.g. a file name
+        """
+        self.run_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started = time.time()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.calls: List[Dict[str, object]] = []
+        self.counters: Dict[str, int] = {}
+        self.error: Optional[str] = None
+        self.profile_path: Optional[str] = None
+        self._start = time.perf_counter()
+        self._seconds: Optional[float] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._lock = threading.Lock()
+
+    def start_profiler(self):
+        """
+        Profile the calling thread with cProfile until stop_profiler() or finish().
+
+        Chunk workers run on other threads and are not included; their API
+        calls and stages are still timed.
+        """
+        if self._profiler is not None:
+            return
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError as e:
+            # Another profiler is already running in this process
+            print(f"Profiling disabled for run {self.run_id}: {e}")
+            self._profiler = None
+
+    def stop_profiler(self, log_path: Optional[str] = None):
+        """
+        Stop the profiler and save the profile; must be called from the profiled thread.
+
+        Args:
+            log_path: JSON lines file whose directory receives the profile, defaults to FLASHCARD_METRICS_LOG
+        """
+        if self._profiler is None:
+            return
+        self._profiler.disable()
+        log_path = log_path or metrics_log_path()
+        self._save_profile(os.path.dirname(log_path) if log_path else None)
+
+    def record_stage(self, name: str, seconds: float):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+            stage["seconds"] += seconds
+            stage["count"] += 1
+
+    def record_call(self, call: Dict[str, object]):
+        with self._lock:
+            self.calls.append(call)
+
+    def add_usage(self, prompt_tokens: int, completion_tokens: int):
+        """Attach token usage to the latest successful call that has none, e.g. a finished stream."""
+        with self._lock:
+            for call in reversed(self.calls):
+                if call.get("prompt_tokens") is None and not call.get("error"):
+                    call["prompt_tokens"] = prompt_tokens
+                    call["completion_tokens"] = completion_tokens
+                    call["estimated_usage"] = True
+                    return
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds if self._seconds is not None else time.perf_counter() - self._start
+
+    def totals(self) -> Dict[str, float]:
+        """Per-run totals: wall time, API calls, latency, retries and tokens."""
+        with self._lock:
+            calls = list(self.calls)
+        return {
+            "seconds": round(self.seconds, 4),
+            "api_calls": len(calls),
+            "api_failures": sum(1 for call in calls if call.get("error")),
+            "api_seconds": round(sum(call["latency"] for call in calls), 4),
+            "retries": sum(call["retries"] for call in calls),
+            "prompt_tokens": sum(call.get("prompt_tokens") or 0 for call in calls),
+            "completion_tokens": sum(call.get("completion_tokens") or 0 for call in calls)
+        }
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+            counters = dict(self.counters)
+        return {
+            "run_id": self.run_id,
+            "label": self.label,
+            "started": self.started,
+            "error": self.error,
+            "totals": self.totals(),
+            "stages": stages,
+            "counters": counters,
+            "profile": self.profile_path
+        }
+
+    def finish(self, error: Optional[str] = None, log_path: Optional[str] = None) -> Dict[str, object]:
+        """
+        Stop the clock and the profiler and append the run to the JSON log.
+
+        Args:
+            error: Why the run failed, if it did
+            log_path: JSON lines file, defaults to FLASHCARD_METRICS_LOG
+
+        Returns:
+            The run summary
+        """
+        if self._seconds is not None:
+            return self.summary()
+        self._seconds = time.perf_counter() - self._start
+        self.error = error
+        log_path = log_path or metrics_log_path()
+        self.stop_profiler(log_path)
+
+        summary = self.summary()
+        if log_path:
+            events = [
+                {"event": "api_call", "run_id": self.run_id, **call} for call in self.calls
+            ] + [
+                {"event": "stage", "run_id": self.run_id, "stage": name, **stage}
+                for name, stage in summary["stages"].items()
+            ] + [{"event": "run", **summary}]
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+                with _log_lock, open(log_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(event) + "\n" for event in events))
+            except OSError as e:
+                print(f"Could not write metrics log {log_path}: {e}")
+        return summary
+
+    def _save_profile(self, directory: Optional[str]):
+        """Print the hottest functions and keep the full profile for pstats/snakeviz."""
+        output = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=output)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        print(f"Profile of run {self.run_id} ({self.label}):\n{output.getvalue()}")
+
+        if directory:
+            try:
+                os.makedirs(os.path.join(directory, "profiles"), exist_ok=True)
+                self.profile_path = os.path.join(directory, "profiles", f"{self.run_id}.prof")
+                stats.dump_stats(self.profile_path)
+            except OSError as e:
+                print(f"Could not save profile: {e}")
+                self.profile_path = None
+        self._profiler = None
+
+def profiling_enabled() -> bool:
+    """Whether FLASHCARD_PROFILE asks for generation runs to be profiled."""
+    return os.environ.get("FLASHCARD_PROFILE", "").lower() in ("1", "true", "yes")
+
+def metrics_log_path() -> Optional[str]:
+    """JSON lines metrics log from FLASHCARD_METRICS_LOG, None when FLASHCARD_METRICS_DISABLED is set."""
+    if os.environ.get("FLASHCARD_METRICS_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    return os.environ.get("FLASHCARD_METRICS_LOG", DEFAULT_METRICS_LOG)
+
+def current_run() -> Optional[RunMetrics]:
+    return _current.get()
+
+@contextmanager
+def activate(run: Optional[RunMetrics]) -> Iterator[Optional[RunMetrics]]:
+    """Make ``run`` collect the metrics recorded inside the block; None records nothing."""
+    token = _current.set(run)
+    try:
+        yield run
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the time spent inside the block to a stage of the current run, if any."""
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.record_stage(stage, time.perf_counter() - start)
+
+def record_call(seconds: float, latency: float, retries: int, response=None,
+                error: Optional[Exception] = None):
+    """
+    Record one API call in the current run, if any.
+
+    Args:
+        seconds: Time from the first attempt until the call returned, including waits
+        latency: Round trip of the last attempt
+        retries: Attempts after the first one
+        response: API response; its usage provides the token counts
+        error: The final error of a failed call
+    """
+    run = _current.get()
+    if run is None:
+        return
+    usage = getattr(response, "usage", None)
+    run.record_call({
+        "seconds": round(seconds, 4),
+        "latency": round(latency, 4),
+        "retries": retries,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "error": f"{error.__class__.__name__}: {error}" if error is not None else None
+    })
+
+def record_usage(prompt_tokens: int, completion_tokens: int):
+    """Record token usage the API did not report, such as for streamed responses."""
+    run = _current.get()
+    if run is not None:
+        run.add_usage(prompt_tokens, completion_tokens)
+
+def increment(name: str, amount: int = 1):
+    """Count an event, such as a cache hit or parser fallback, in the current run."""
+    run = _current.get()
+    if run is not None:
+        run.increment(name, amount)
+
+def load_runs(log_path: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, object]]:
+    """
+    Read run summaries back from the JSON log, oldest first.
+
+    Args:
+        log_path: JSON lines file, defaults to FLASHCARD_METRICS_LOG
+        limit: Keep only the most recent runs
+
+    Returns:
+        List of run summaries
+    """
+    log_path = log_path or metrics_log_path()
+    if not log_path or not os.path.exists(log_path):
+        return []
+    runs = []
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            if '"event": "run"' not in line:
+                continue
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs[-limit:] if limit else runs
+
+def runs_csv(runs: List[Dict[str, object]]) -> str:
+    """Flatten run summaries into CSV with one row per run, for tracking cost and latency."""
+    columns = ["run_id", "label", "started", "error", "seconds", "api_calls", "api_failures",
+               "api_seconds", "retries", "prompt_tokens", "completion_tokens"]
+    stages = sorted({stage for run in runs for stage in run.get("stages", {})})
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(columns + [f"{stage}_seconds" for stage in stages])
+    for run in runs:
+        totals = run.get("totals", {})
+        row = [run.get("run_id"), run.get("label"),
+               time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(run.get("started", 0))), run.get("error") or ""]
+        row += [totals.get(column, "") for column in columns[4:]]
+        row += [round(run["stages"][stage]["seconds"], 4) if stage in run.get("stages", {}) else ""
+                for stage in stages]
+        writer.writerow(row)
+    return output.getvalue()
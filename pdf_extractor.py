@@ -0,0 +1,362 @@
+import hashlib
+import io
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from cache import DEFAULT_CACHE_DIR, DiskCache, MemoryLRU
+from metrics import timed
+
+MEMORY_BUDGET = 64 * 1024 * 1024  # bytes of page text kept in process memory
+DISK_BUDGET = 512 * 1024 * 1024  # bytes of page text kept on disk
+PAGES_PER_TASK = 16  # pages handed to a worker process at a time
+SPOOL_BLOCK_SIZE = 1024 * 1024  # bytes copied per read when spooling uploads to disk
+
+class PageCache:
+    """
+    Two-level cache of extracted PDF page text keyed by file content hash.
+
+    Pages are stored individually: a small in-memory LRU answers reruns within
+    the process, and a shared SQLite cache answers re-uploads across sessions
+    and processes. Both levels are bounded by a byte budget.
+    """
+
+    def __init__(self, disk: DiskCache, memory_bytes: int = MEMORY_BUDGET):
+        self.disk = disk
+        self.memory = MemoryLRU(memory_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def _set(self, key: str, value: bytes):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def get_page_count(self, file_hash: str) -> Optional[int]:
+        value = self._get(f"{file_hash}:pages")
+        return int(value) if value is not None else None
+
+    def set_page_count(self, file_hash: str, count: int):
+        self._set(f"{file_hash}:pages", str(count).encode("ascii"))
+
+    def get_page(self, file_hash: str, page_number: int) -> Optional[str]:
+        value = self._get(f"{file_hash}:{page_number}")
+        return value.decode("utf-8") if value is not None else None
+
+    def set_page(self, file_hash: str, page_number: int, text: str):
+        self._set(f"{file_hash}:{page_number}", text.encode("utf-8"))
+
+    def get_page_error(self, file_hash: str, page_number: int) -> Optional[str]:
+        value = self._get(f"{file_hash}:{page_number}:error")
+        return value.decode("utf-8") if value is not None else None
+
+    def set_page_error(self, file_hash: str, page_number: int, message: str):
+        """Remember that a page cannot be extracted, so reruns do not parse the PDF again for it."""
+        self._set(f"{file_hash}:{page_number}:error", message.encode("utf-8"))
+
+    def stats(self) -> Dict[str, float]:
+        """Return lookup counters and the hit rate for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache() -> PageCache:
+    """
+    Return the process-wide page text cache.
+
+    Shares FLASHCARD_CACHE_DIR and FLASHCARD_CACHE_DISABLED with the response cache.
+
+    Returns:
+        Shared PageCache instance
+    """
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            directory = os.environ.get("FLASHCARD_CACHE_DIR", DEFAULT_CACHE_DIR)
+            disabled = os.environ.get("FLASHCARD_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+            disk = DiskCache(os.path.join(directory, "pages.sqlite3"), max_bytes=DISK_BUDGET, enabled=not disabled)
+            _page_cache = PageCache(disk, memory_bytes=0 if disabled else MEMORY_BUDGET)
+        return _page_cache
+
+def file_hash(data: bytes) -> str:
+    """Content hash used to key cached extraction results."""
+    return hashlib.sha256(data).hexdigest()
+
+def extract_pages(data: bytes, cache: Optional[PageCache] = None,
+                  max_workers: Optional[int] = None,
+                  pages_per_task: int = PAGES_PER_TASK,
+                  page_numbers: Optional[Sequence[int]] = None) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    """
+    Extract the text of the pages of a PDF, reusing cached pages.
+
+    When every requested page of the file is cached, including pages that
+    failed to extract, the PDF is not parsed at all. Larger
+    sets of uncached pages are split into page ranges and extracted in a
+    process pool, each worker parsing its own copy of the document.
+
+    Args:
+        data: Raw PDF bytes
+        cache: Page cache, defaults to the process-wide cache
+        max_workers: Worker processes, defaults to the number of CPUs
+        pages_per_task: Pages extracted per worker task
+        page_numbers: 1-based pages to extract, defaults to all pages; pages
+            past the end of the document are ignored
+
+    Returns:
+        Tuple of (pages, errors): pages is a list of (page_number, text) for
+        pages that could be read, errors a list of (page_number, message),
+        both in page order
+    """
+    cache = cache if cache is not None else get_page_cache()
+    digest = file_hash(data)
+
+    cached_pages: Dict[int, str] = {}
+    cached_errors: Dict[int, str] = {}
+    page_count = cache.get_page_count(digest)
+    if page_count is not None:
+        wanted = _wanted_pages(page_numbers, page_count)
+        for page_number in wanted:
+            page_text = cache.get_page(digest, page_number)
+            if page_text is not None:
+                cached_pages[page_number] = page_text
+                continue
+            error = cache.get_page_error(digest, page_number)
+            if error is not None:
+                cached_errors[page_number] = error
+        if len(cached_pages) + len(cached_errors) == len(wanted):
+            return sorted(cached_pages.items()), sorted(cached_errors.items())
+
+    pdf_reader = _pdf_reader(io.BytesIO(data))
+    page_count = len(pdf_reader.pages)
+    missing = [n for n in _wanted_pages(page_numbers, page_count) if n not in cached_pages and n not in cached_errors]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers > 1 and len(missing) > pages_per_task:
+        try:
+            extracted, errors = _extract_parallel(data, missing, workers, pages_per_task)
+        except Exception as e:
+            print(f"Parallel extraction failed, falling back to a single process: {e}")
+            extracted, errors = _extract_page_list(pdf_reader, missing)
+    else:
+        extracted, errors = _extract_page_list(pdf_reader, missing)
+
+    for page_number, page_text in extracted:
+        cache.set_page(digest, page_number, page_text)
+    for page_number, message in errors:
+        cache.set_page_error(digest, page_number, message)
+    cache.set_page_count(digest, page_count)
+
+    pages = sorted(list(cached_pages.items()) + extracted)
+    return pages, sorted(list(cached_errors.items()) + errors)
+
+def _wanted_pages(page_numbers: Optional[Sequence[int]], page_count: int) -> List[int]:
+    """Sorted unique 1-based pages to extract, all pages when none are selected."""
+    if not page_numbers:
+        return list(range(1, page_count + 1))
+    return sorted({n for n in page_numbers if 1 <= n <= page_count})
+
+def _extract_page_list(pdf_reader, page_numbers: List[int]) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    """Extract the given 1-based pages, collecting per-page errors."""
+    pages = []
+    errors = []
+    for page_number in page_numbers:
+        try:
+            pages.append((page_number, pdf_reader.pages[page_number - 1].extract_text()))
+        except Exception as e:
+            errors.append((page_number, str(e)))
+    return pages, errors
+
+def _extract_parallel(data: bytes, page_numbers: List[int], workers: int,
+                      pages_per_task: int) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    """Spread page ranges over a process pool and merge the results in page order."""
+    batches = [page_numbers[i:i + pages_per_task] for i in range(0, len(page_numbers), pages_per_task)]
+    workers = min(workers, len(batches))
+
+    pages = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as executor:
+        for batch_pages, batch_errors in executor.map(_extract_in_worker, batches):
+            pages.extend(batch_pages)
+            errors.extend(batch_errors)
+    return pages, errors
+
+_worker_reader = None
+
+def _pdf_reader(source):
+    """Open a PDF; PyPDF2 is only imported once a PDF is actually read."""
+    from PyPDF2 import PdfReader
+    return PdfReader(source)
+
+def _init_worker(data: bytes):
+    """Parse the document once per worker process."""
+    global _worker_reader
+    _worker_reader = _pdf_reader(io.BytesIO(data))
+
+def _extract_in_worker(page_numbers: List[int]) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    return _extract_page_list(_worker_reader, page_numbers)
+
+def spool_upload(uploaded_file, directory: Optional[str] = None) -> str:
+    """
+    Copy an uploaded file to a temporary file in fixed-size blocks.
+
+    The caller owns the returned file and must delete it when done.
+
+    Args:
+        uploaded_file: Binary file-like object
+        directory: Directory for the temporary file
+
+    Returns:
+        Path of the spooled file
+    """
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", dir=directory, delete=False) as spooled:
+        shutil.copyfileobj(uploaded_file, spooled, SPOOL_BLOCK_SIZE)
+    return spooled.name
+
+def iter_pdf_pages(path: str, page_numbers: Optional[Sequence[int]] = None,
+                   cache: Optional[PageCache] = None,
+                   on_error: Optional[Callable[[int, str], None]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yield (page_number, text) for a PDF on disk.
+
+    The file is memory-mapped rather than read into memory, and pages are
+    extracted one at a time as the consumer asks for them, reusing the page
+    cache shared with extract_pages.
+
+    Args:
+        path: PDF file path
+        page_numbers: 1-based pages to read in this order, defaults to all pages
+        cache: Page cache, defaults to the process-wide cache
+        on_error: Called with (page_number, message) for pages that fail
+
+    Returns:
+        Iterator over (page_number, text) pairs
+    """
+    cache = cache if cache is not None else get_page_cache()
+
+    with open(path, "rb") as pdf_file, mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        digest = hashlib.sha256(mapped).hexdigest()
+        pdf_reader = None
+
+        page_count = cache.get_page_count(digest)
+        if page_count is None:
+            pdf_reader = _pdf_reader(mapped)
+            page_count = len(pdf_reader.pages)
+            cache.set_page_count(digest, page_count)
+
+        for page_number in page_numbers or range(1, page_count + 1):
+            if not 1 <= page_number <= page_count:
+                continue
+
+            with timed("pdf_extraction"):
+                page_text = cache.get_page(digest, page_number)
+                error = cache.get_page_error(digest, page_number) if page_text is None else None
+                if page_text is None and error is None:
+                    if pdf_reader is None:
+                        pdf_reader = _pdf_reader(mapped)
+                    try:
+                        page_text = pdf_reader.pages[page_number - 1].extract_text()
+                        cache.set_page(digest, page_number, page_text)
+                    except Exception as e:
+                        error = str(e)
+                        cache.set_page_error(digest, page_number, error)
+                if error is not None:
+                    if on_error:
+                        on_error(page_number, error)
+                    continue
+
+            yield page_number, page_text
+
+        # Drop PyPDF2's references into the map before it is closed
+        del pdf_reader
+
+def parse_page_range(spec: str, page_count: Optional[int] = None) -> List[int]:
+    """
+    Parse a page selection such as "3-5, 8, 10-" into sorted page numbers.
+
+    Args:
+        spec: Comma separated pages and ranges; open-ended ranges need page_count
+        page_count: Number of pages in the document, used to clamp ranges
+
+    Returns:
+        Sorted list of unique 1-based page numbers
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)\s*(?:[-–]\s*(\d*))?", part)
+        if not match:
+            raise ValueError(f"Invalid page range: {part!r}")
+
+        start = int(match.group(1))
+        if match.group(2) is None:
+            end = start
+        elif match.group(2):
+            end = int(match.group(2))
+        elif page_count is not None:
+            end = page_count
+        else:
+            raise ValueError(f"Open-ended range needs a page count: {part!r}")
+
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part!r}")
+        if page_count is not None:
+            end = min(end, page_count)
+        pages.update(range(start, end + 1))
+
+    return sorted(pages)
+
+def join_pages(pages: List[Tuple[int, str]]) -> str:
+    """Assemble page texts with "--- Page N ---" markers, skipping blank pages."""
+    return "".join(
+        f"\n--- Page {page_number} ---\n{page_text}\n"
+        for page_number, page_text in pages
+        if page_text.strip()
+    ).strip()
+
+def extract_pdf_text(data: bytes, page_numbers: Optional[Sequence[int]] = None,
+                     cache: Optional[PageCache] = None) -> Tuple[str, List[Tuple[int, str]]]:
+    """
+    Extract the text of a PDF with page markers, optionally limited to some pages.
+
+    Only the selected pages are parsed or looked up in the page cache.
+
+    Args:
+        data: Raw PDF bytes
+        page_numbers: Optional 1-based pages to keep
+        cache: Page cache, defaults to the process-wide cache
+
+    Returns:
+        Tuple of (text, errors) where errors lists (page_number, message)
+        for selected pages that could not be read
+    """
+    with timed("pdf_extraction"):
+        pages, errors = extract_pages(data, cache, page_numbers=page_numbers)
+
+    return join_pages(pages), errors
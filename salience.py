@@ -0,0 +1,84 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from chunker import count_tokens
+
+KEY_TERMS = 25  # highest TF-IDF terms of a chunk that selection tries to cover
+
+_WORD = re.compile(r"[^\W\d_]{3,}")  # words of three or more letters
+_STOPWORDS = frozenset("""
+about above after again against also although among and any are because been before being below
+between both but can cannot could did does doing down during each either else even ever every for
+from further had has have having her here hers herself him himself his how however into its itself
+just may might more most much must neither nor not now off once only other ought our ours
+ourselves out over own page same shall she should since some such than that the their theirs them
+themselves then there these they this those though through thus too under until upon very was
+were what when where whether which while who whom whose why will with within without would yet
+you your yours yourself yourselves
+""".split())
+
+def key_terms(chunk: str) -> Counter:
+    """Count the content words of a chunk, lowercased and without stopwords."""
+    return Counter(word for word in _WORD.findall(chunk.lower()) if word not in _STOPWORDS)
+
+def select_chunks(chunks: List[str], max_chunks: Optional[int] = None,
+                  max_tokens: Optional[int] = None,
+                  counter: Callable[[str], int] = count_tokens) -> List[str]:
+    """
+    Pick the chunks that together cover the most key terms of a document within a budget.
+
+    Every chunk's KEY_TERMS highest TF-IDF terms are its key terms, worth their
+    IDF: terms specific to a few chunks count most, terms found everywhere
+    little. Chunks are then chosen greedily by the weight of key terms not yet
+    covered, which spreads the selection over all topics and chapters of the
+    document instead of favouring its start. Lazy evaluation keeps this fast on
+    thousands of chunks.
+
+    Args:
+        chunks: Chunks in document order
+        max_chunks: Most chunks to keep, i.e. API calls; None for no limit
+        max_tokens: Most source tokens to keep in total; None for no limit
+        counter: Token counter for the token budget
+
+    Returns:
+        Selected chunks in document order; all of them if they fit the budget
+    """
+    if max_chunks is None and max_tokens is None:
+        return list(chunks)
+    tokens = [counter(chunk) for chunk in chunks] if max_tokens is not None else [0] * len(chunks)
+    fits_chunks = max_chunks is None or len(chunks) <= max_chunks
+    fits_tokens = max_tokens is None or sum(tokens) <= max_tokens
+    if fits_chunks and fits_tokens:
+        return list(chunks)
+
+    counts = [key_terms(chunk) for chunk in chunks]
+    document_frequency = Counter(term for terms in counts for term in terms)
+    idf = {term: math.log((1 + len(chunks)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+    chunk_keys: List[Dict[str, float]] = []
+    for terms in counts:
+        scores = {term: (1 + math.log(count)) * idf[term] for term, count in terms.items()}
+        chunk_keys.append({term: idf[term] for term in heapq.nlargest(KEY_TERMS, scores, key=scores.get)})
+
+    # Max-heap of (negated gain, position); a popped gain is recomputed before it is trusted
+    heap = [(-sum(keys.values()), index) for index, keys in enumerate(chunk_keys)]
+    heapq.heapify(heap)
+    covered = set()
+    selected = []
+    tokens_left = max_tokens
+    while heap and (max_chunks is None or len(selected) < max_chunks):
+        stale_gain, index = heapq.heappop(heap)
+        if tokens_left is not None and tokens[index] > tokens_left:
+            continue
+        gain = sum(weight for term, weight in chunk_keys[index].items() if term not in covered)
+        if heap and -gain > heap[0][0]:
+            heapq.heappush(heap, (-gain, index))
+            continue
+        selected.append(index)
+        covered.update(chunk_keys[index])
+        if tokens_left is not None:
+            tokens_left -= tokens[index]
+    return [chunks[index] for index in sorted(selected)]
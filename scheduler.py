@@ -0,0 +1,287 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import metrics
+
+MAX_RETRIES = 6  # attempts after the first one for throttled or failed requests
+BASE_DELAY = 1.0  # seconds; backoff doubles per attempt from here
+MAX_DELAY = 60.0  # seconds; longest single backoff
+INITIAL_CONCURRENCY = 4  # requests in flight before any feedback
+MAX_CONCURRENCY = 16  # ceiling for additive increase
+MIN_CONCURRENCY = 1
+DECREASE_COOLDOWN = 2.0  # seconds; throttles within this window only halve concurrency once
+ASYNC_POLL = 0.05  # seconds between slot checks of async callers, which cannot block on the condition
+
+T = TypeVar("T")
+
+class TokenBucket:
+    """
+    Reservation-based token bucket refilled continuously at ``per_minute`` tokens.
+
+    A reservation may take the bucket below zero; the caller then sleeps for
+    the returned wait, so concurrent callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens and return how many seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-ms) headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """Throttling, timeouts, connection errors and 5xx responses are retried."""
+    import openai
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted billing quota does not recover by waiting
+        return getattr(error, "code", None) != "insufficient_quota"
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+class RequestScheduler:
+    """
+    Admission control in front of the OpenAI client.
+
+    Each request first reserves capacity from optional requests-per-minute and
+    tokens-per-minute buckets, using a token estimate made before sending, and
+    then waits for a concurrency slot. Throttled and transiently failed requests
+    are retried with exponential backoff and full jitter, honoring Retry-After;
+    a 429 also pauses every caller until the server's wait has passed.
+    Concurrency adapts AIMD-style: it halves on throttling and grows by one
+    request per round trip of successes, up to ``max_concurrency``.
+    Blocking callers use call() and coroutines use acall(); both share the
+    same quotas and concurrency limit.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 initial_concurrency: int = INITIAL_CONCURRENCY,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 min_concurrency: int = MIN_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES,
+                 base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY):
+        """
+        Args:
+            requests_per_minute: Request quota, None for no limit
+            tokens_per_minute: Token quota, None for no limit
+            initial_concurrency: Requests allowed in flight at the start
+            max_concurrency: Upper bound for the adaptive concurrency
+            min_concurrency: Lower bound for the adaptive concurrency
+            max_retries: Retries per request before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Longest backoff delay in seconds
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.min_concurrency = min_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.in_flight = 0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0}
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def call(self, request: Callable[[], T], estimated_tokens: int = 0) -> T:
+        """
+        Run ``request`` under the rate limits, retrying transient failures.
+
+        Args:
+            request: Function performing one API call
+            estimated_tokens: Prompt plus maximum completion tokens of the call
+
+        Returns:
+            The result of ``request``
+        """
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            self._admit(estimated_tokens)
+            sent = time.perf_counter()
+            try:
+                result = request()
+            except Exception as e:
+                self._release()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    with self._condition:
+                        self.stats["failures"] += 1
+                    now = time.perf_counter()
+                    metrics.record_call(now - start, now - sent, attempt, error=e)
+                    raise
+                self._backoff(e, attempt)
+                attempt += 1
+                continue
+            except BaseException:
+                # Interrupted while in flight, e.g. KeyboardInterrupt
+                self._release()
+                raise
+            self._release(success=True)
+            now = time.perf_counter()
+            metrics.record_call(now - start, now - sent, attempt, response=result)
+            return result
+
+    async def acall(self, request: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        """
+        Async version of call(): waits without blocking the event loop.
+
+        Args:
+            request: Function returning a coroutine that performs one API call
+            estimated_tokens: Prompt plus maximum completion tokens of the call
+
+        Returns:
+            The result of the awaited request
+        """
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            await self._aadmit(estimated_tokens)
+            sent = time.perf_counter()
+            try:
+                result = await request()
+            except Exception as e:
+                self._release()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    with self._condition:
+                        self.stats["failures"] += 1
+                    now = time.perf_counter()
+                    metrics.record_call(now - start, now - sent, attempt, error=e)
+                    raise
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled while in flight
+                self._release()
+                raise
+            self._release(success=True)
+            now = time.perf_counter()
+            metrics.record_call(now - start, now - sent, attempt, response=result)
+            return result
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Take quota from the buckets and return how long to wait for it."""
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def _admit(self, estimated_tokens: int):
+        """Wait for quota and a concurrency slot."""
+        wait = self._reserve(estimated_tokens)
+        if wait:
+            time.sleep(wait)
+
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+            self.stats["requests"] += 1
+
+    async def _aadmit(self, estimated_tokens: int):
+        """Wait for quota and a concurrency slot without blocking the event loop."""
+        wait = self._reserve(estimated_tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+        while True:
+            with self._condition:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self.stats["requests"] += 1
+                    return
+            await asyncio.sleep(pause if pause > 0 else ASYNC_POLL)
+
+    def _release(self, success: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if success and self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _backoff(self, error: Exception, attempt: int):
+        """Shrink concurrency on throttling and sleep before the next attempt."""
+        time.sleep(self._retry_delay(error, attempt))
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Record a failed attempt, shrink concurrency on throttling and return the backoff delay."""
+        import openai
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+
+        with self._condition:
+            self.stats["retries"] += 1
+            if isinstance(error, openai.RateLimitError):
+                self.stats["throttled"] += 1
+                now = time.monotonic()
+                if now - self._last_decrease > DECREASE_COOLDOWN:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+                if server_delay is not None:
+                    self._paused_until = max(self._paused_until, now + delay)
+            self._condition.notify_all()
+
+        print(f"Request failed ({error.__class__.__name__}), retrying in {delay:.1f}s "
+              f"(attempt {attempt + 1}/{self.max_retries}, concurrency {int(self.limit)})")
+        return delay
+
+def scheduler_from_env() -> RequestScheduler:
+    """
+    Create a scheduler configured through FLASHCARD_RPM, FLASHCARD_TPM and
+    FLASHCARD_MAX_CONCURRENCY environment variables.
+
+    Returns:
+        New RequestScheduler
+    """
+    def number(name: str) -> Optional[float]:
+        value = os.environ.get(name)
+        return float(value) if value else None
+
+    max_concurrency = number("FLASHCARD_MAX_CONCURRENCY")
+    return RequestScheduler(
+        requests_per_minute=number("FLASHCARD_RPM"),
+        tokens_per_minute=number("FLASHCARD_TPM"),
+        max_concurrency=int(max_concurrency) if max_concurrency else MAX_CONCURRENCY
+    )
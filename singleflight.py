@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from cache import DEFAULT_CACHE_DIR
+from metrics import increment
+
+LEASE_SECONDS = 600.0  # a leader that neither finishes nor dies within this is presumed stuck
+RESULT_SECONDS = 10.0  # finished results are kept this long for callers already waiting on them
+POLL_INTERVAL = 0.1  # seconds between checks on a flight led by another process
+
+class _Abandoned(Exception):
+    """The leader was cancelled; a waiting caller should take over."""
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls so only one of them does the work.
+
+    Within a process, callers with the same key wait on the leader's future. A
+    SQLite lease table extends this across processes on the host sharing the
+    database: one process leads each key, the others poll its row for the
+    result. Only calls that overlap are coalesced: a call arriving after the
+    leader finished does the work again. Results must be JSON-serializable;
+    every caller gets its own copy, so callers may modify what they receive.
+    When the leader fails, waiting callers in the same process get its error,
+    and another process takes over.
+    """
+
+    def __init__(self, path: Optional[str] = None, enabled: bool = True):
+        """
+        Args:
+            path: SQLite lease database shared by processes, None to coalesce within this process only
+            enabled: When False every call runs on its own
+        """
+        self.path = path
+        self.enabled = enabled
+        self._flights: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._owner_host = socket.gethostname()
+
+        if self.enabled and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                conn = self._connection()
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS flights ("
+                    "key TEXT PRIMARY KEY, owner TEXT NOT NULL, host TEXT NOT NULL, pid INTEGER NOT NULL, "
+                    "expires REAL NOT NULL, finished REAL, result TEXT)"
+                )
+                conn.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Cross-process request coalescing disabled, could not open {path}: {e}")
+                self.path = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection; sqlite3 connections are not shared."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def do(self, key: str, fn: Callable[[], object]) -> object:
+        """
+        Run ``fn`` unless an identical call is in flight, then wait for its result.
+
+        Args:
+            key: Identity of the call, e.g. a hash of its input and parameters
+            fn: Does the work
+
+        Returns:
+            The result of ``fn`` or of the identical call
+        """
+        if not self.enabled:
+            return fn()
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                encoded = future.result()
+            except _Abandoned:
+                continue
+            increment("coalesced_requests")
+            return json.loads(encoded)
+
+        owner = leader = None
+        try:
+            while True:
+                owner, encoded, leader = self._acquire(key, leader)
+                if owner is not None or encoded is not None:
+                    break
+                time.sleep(POLL_INTERVAL)
+            if owner is None:
+                self._leave(key, future)
+                if not future.done():
+                    future.set_result(encoded)
+                return json.loads(encoded)
+            result = fn()
+            self._finish(key, owner, future, json.dumps(result, ensure_ascii=False))
+            return result
+        except BaseException as e:
+            self._fail(key, owner, future, e)
+            raise
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[object]]) -> object:
+        """
+        Async version of do(); waiting never blocks the event loop.
+
+        Args:
+            key: Identity of the call, e.g. a hash of its input and parameters
+            fn: Returns the coroutine doing the work
+
+        Returns:
+            The result of ``fn`` or of the identical call
+        """
+        if not self.enabled:
+            return await fn()
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled waiter must not cancel the flight shared with other callers
+                encoded = await asyncio.shield(asyncio.wrap_future(future))
+            except _Abandoned:
+                continue
+            increment("coalesced_requests")
+            return json.loads(encoded)
+
+        owner = leader = None
+        try:
+            while True:
+                owner, encoded, leader = self._acquire(key, leader)
+                if owner is not None or encoded is not None:
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+            if owner is None:
+                self._leave(key, future)
+                if not future.done():
+                    future.set_result(encoded)
+                return json.loads(encoded)
+            result = await fn()
+            self._finish(key, owner, future, json.dumps(result, ensure_ascii=False))
+            return result
+        except BaseException as e:
+            self._fail(key, owner, future, e)
+            raise
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-process flight for ``key`` and whether the caller leads it."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            return future, True
+
+    def _leave(self, key: str, future: Future):
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def _acquire(self, key: str, waiting_on: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Try to lead ``key`` across processes.
+
+        Args:
+            key: Identity of the call
+            waiting_on: Lease owner of the flight the caller has been waiting for, if any
+
+        Returns:
+            (lease owner id, None, None) when this process now leads; (None,
+            encoded result, None) once the flight the caller waited on has
+            finished; (None, None, leading owner id) while another process leads
+        """
+        owner = uuid.uuid4().hex
+        if not self.path:
+            return owner, None, None
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT owner, host, pid, expires, finished, result FROM flights WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    leader, host, pid, expires, finished, result = row
+                    if finished is not None and leader == waiting_on:
+                        increment("coalesced_requests")
+                        return None, result, None
+                    if finished is None and expires > now and not self._owner_dead(host, pid):
+                        return None, None, leader
+                conn.execute(
+                    "INSERT OR REPLACE INTO flights (key, owner, host, pid, expires, finished, result) "
+                    "VALUES (?, ?, ?, ?, ?, NULL, NULL)",
+                    (key, owner, self._owner_host, os.getpid(), now + LEASE_SECONDS)
+                )
+                conn.execute(
+                    "DELETE FROM flights WHERE expires < ? OR finished < ?", (now, now - RESULT_SECONDS)
+                )
+            return owner, None, None
+        except sqlite3.Error as e:
+            print(f"Request coalescing lease failed, calling without it: {e}")
+            return owner, None, None
+
+    def _finish(self, key: str, owner: str, future: Future, encoded: str):
+        """Hand the leader's result to the callers waiting here and in other processes."""
+        self._release(key, owner, encoded)
+        self._leave(key, future)
+        if not future.done():
+            future.set_result(encoded)
+
+    def _fail(self, key: str, owner: Optional[str], future: Future, error: BaseException):
+        """Pass a leader's error to the callers waiting here; cancellation makes them retry instead."""
+        if owner is not None:
+            self._release(key, owner, None)
+        self._leave(key, future)
+        if not future.done():
+            future.set_exception(error if isinstance(error, Exception) else _Abandoned())
+
+    def _release(self, key: str, owner: str, result: Optional[str]):
+        """Publish the result of a flight, or drop the lease after a failure so another process retries."""
+        if not self.path:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                if result is None:
+                    conn.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner))
+                else:
+                    conn.execute(
+                        "UPDATE flights SET finished = ?, result = ? WHERE key = ? AND owner = ?",
+                        (time.time(), result, key, owner)
+                    )
+        except sqlite3.Error as e:
+            print(f"Request coalescing release failed: {e}")
+
+    def _owner_dead(self, host: str, pid: int) -> bool:
+        """Whether the leading process is gone; only processes on this host can be checked."""
+        if host != self._owner_host or pid == os.getpid():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """
+    Return the process-wide request coalescer.
+
+    Its lease database lives next to the response cache in FLASHCARD_CACHE_DIR,
+    so app processes sharing the cache also share in-flight requests.
+    FLASHCARD_SINGLE_FLIGHT_DISABLED turns coalescing off.
+
+    Returns:
+        Shared SingleFlight instance
+    """
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            directory = os.environ.get("FLASHCARD_CACHE_DIR", DEFAULT_CACHE_DIR)
+            disabled = os.environ.get("FLASHCARD_SINGLE_FLIGHT_DISABLED", "").lower() in ("1", "true", "yes")
+            _single_flight = SingleFlight(os.path.join(directory, "flights.sqlite3"), enabled=not disabled)
+        return _single_flight
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+
+
+class CancelledWaiterTest(unittest.TestCase):
+    """Cancelling one waiter must not affect the leader or the other waiters of a flight."""
+
+    def run_flight(self, path=None):
+        flights = SingleFlight(path)
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.3)
+            return {"cards": [1]}
+
+        async def main():
+            leader = asyncio.ensure_future(flights.ado("key", work))
+            await asyncio.sleep(0.05)
+            cancelled = asyncio.ensure_future(flights.ado("key", work))
+            waiter = asyncio.ensure_future(flights.ado("key", work))
+            await asyncio.sleep(0.05)
+            cancelled.cancel()
+            return await asyncio.gather(leader, cancelled, waiter, return_exceptions=True)
+
+        leader, cancelled, waiter = asyncio.run(main())
+        self.assertEqual(leader, {"cards": [1]})
+        self.assertIsInstance(cancelled, asyncio.CancelledError)
+        self.assertEqual(waiter, {"cards": [1]})
+        self.assertEqual(len(calls), 1)
+
+    def test_in_process(self):
+        self.run_flight()
+
+    def test_with_lease_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.run_flight(os.path.join(directory, "flights.sqlite3"))
+
+    def test_thread_leader(self):
+        flights = SingleFlight()
+        results = {}
+
+        def work():
+            time.sleep(0.3)
+            return [1]
+
+        leader = threading.Thread(target=lambda: results.setdefault("leader", flights.do("key", work)))
+        leader.start()
+        time.sleep(0.05)
+
+        async def unexpected():
+            raise AssertionError("waiters must not run the work")
+
+        async def main():
+            cancelled = asyncio.ensure_future(flights.ado("key", unexpected))
+            waiter = asyncio.ensure_future(flights.ado("key", unexpected))
+            await asyncio.sleep(0.05)
+            cancelled.cancel()
+            return await asyncio.gather(cancelled, waiter, return_exceptions=True)
+
+        cancelled, waiter = asyncio.run(main())
+        leader.join()
+        self.assertIsInstance(cancelled, asyncio.CancelledError)
+        self.assertEqual(waiter, [1])
+        self.assertEqual(results["leader"], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
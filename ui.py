@@ -1,7 +1,39 @@
 import streamlit as st
-import pandas as pd
+import streamlit.components.v1 as components
 import json
-from typing import List, Dict, Optional
+import time
+from typing import Callable, List, Dict, Optional, Tuple
+from deck_store import DeckStore
+from exporters import export_bytes
+from metrics import load_runs, runs_csv
+
+PAGE_SIZES = [10, 25, 50, 100]  # card view page sizes, the first is the default
+TABLE_PAGE_SIZES = [100, 500, 1000]  # table view rows per page, the first is the default
+
+# Download button settings per export format
+DOWNLOADS = {
+    "csv": {
+        "name": "CSV",
+        "label": "📊 Download CSV",
+        "file_name": "flashcards.csv",
+        "mime": "text/csv",
+        "help": "Download as CSV for spreadsheet applications"
+    },
+    "json": {
+        "name": "JSON",
+        "label": "📋 Download JSON",
+        "file_name": "flashcards.json",
+        "mime": "application/json",
+        "help": "Download as JSON for programmatic use"
+    },
+    "anki": {
+        "name": "Anki Format",
+        "label": "🎴 Download Anki Format",
+        "file_name": "flashcards_anki.txt",
+        "mime": "text/plain",
+        "help": "Download in Anki-compatible format"
+    }
+}
 
 def api_key_input() -> Optional[str]:
     """
@@ -55,6 +87,19 @@ def file_upload():
     
     return uploaded_file
 
+def page_range_input() -> str:
+    """
+    Create page range input for PDF uploads.
+    
+    Returns:
+        Page range specification, empty for all pages
+    """
+    return st.text_input(
+        "Pages to use (optional):",
+        placeholder="e.g. 3-5, 8",
+        help="Only generate flashcards from these pages, for example a few chapters of a textbook"
+    ).strip()
+
 def text_input() -> str:
     """
     Create text input area.
@@ -126,35 +171,138 @@ def generation_settings() -> Dict[str, any]:
             help="Automatically assign difficulty levels to flashcards"
         )
         
+        stream = st.checkbox(
+            "Show cards as they arrive",
+            value=True,
+            help="Preview each flashcard as soon as it is generated"
+        )
+        
+        use_cache = st.checkbox(
+            "Reuse cached responses",
+            value=True,
+            help="Answer repeated content from the local response cache instead of calling OpenAI again"
+        )
+        
+        structured_output = st.checkbox(
+            "Structured JSON output",
+            value=False,
+            help="Ask the model for JSON instead of Q:/A: text: a shorter prompt and no text parsing"
+        )
+        
+        deduplicate = st.checkbox(
+            "Remove duplicate cards",
+            value=True,
+            help="Drop flashcards that repeat or nearly repeat an earlier card"
+        )
+        
+        similarity_threshold = st.slider(
+            "Duplicate similarity threshold",
+            min_value=0.5,
+            max_value=1.0,
+            value=0.8,
+            step=0.05,
+            disabled=not deduplicate,
+            help="Cards whose wording overlaps at least this much count as duplicates"
+        )
+        
+        budget_mode = st.checkbox(
+            "Budget mode",
+            value=False,
+            help="Cap the API calls per document: only the chunks covering the most distinct key terms are sent"
+        )
+        
+        max_calls = st.number_input(
+            "Max API calls per document",
+            min_value=1,
+            max_value=200,
+            value=10,
+            disabled=not budget_mode,
+            help="Each call turns one chunk of about 1500 tokens into 10-12 flashcards"
+        )
+        
         return {
             "difficulty_filter": difficulty_filter,
-            "auto_difficulty": auto_difficulty
+            "auto_difficulty": auto_difficulty,
+            "stream": stream,
+            "use_cache": use_cache,
+            "output_format": "json" if structured_output else "text",
+            "deduplicate": deduplicate,
+            "similarity_threshold": similarity_threshold,
+            "max_calls": int(max_calls) if budget_mode else None
         }
 
-def display_flashcards(flashcards: List[Dict[str, str]], settings: Dict[str, any]):
+def saved_decks(store: DeckStore, owner: str) -> Optional[int]:
     """
-    Display generated flashcards with various viewing options.
+    Sidebar picker for previously generated decks.
     
     Args:
-        flashcards: List of flashcard dictionaries
+        store: Deck store to list decks from
+        owner: Only decks of this owner are listed
+    
+    Returns:
+        Id of the deck to open, or None if none was chosen on this run
+    """
+    st.sidebar.header("🗂️ Saved Decks")
+    decks = store.list_decks(owner=owner)
+    if not decks:
+        st.sidebar.caption("Generated decks are saved here.")
+        return None
+    
+    labels = {
+        deck["id"]: f"{deck['name']} · {deck['card_count']} cards · "
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(deck['created']))}"
+        for deck in decks
+    }
+    deck_id = st.sidebar.selectbox("Deck", list(labels), format_func=labels.get, key="saved_deck")
+    if st.sidebar.button("📂 Open Deck", key="open_deck"):
+        return deck_id
+    return None
+
+def display_flashcards(store: DeckStore, deck_id: int, settings: Dict[str, any]):
+    """
+    Display a stored deck with various viewing options.
+    
+    Args:
+        store: Deck store holding the cards
+        deck_id: Deck to display
         settings: Display settings
     """
-    if not flashcards:
+    difficulties = settings.get("difficulty_filter") or None
+    total = store.count_cards(deck_id)
+    if not total:
         st.info("No flashcards to display.")
         return
     
-    # Filter by difficulty if enabled
-    if settings.get("difficulty_filter"):
-        flashcards = [
-            card for card in flashcards 
-            if card.get("difficulty", "Medium") in settings["difficulty_filter"]
-        ]
+    st.header(f"📚 Generated Flashcards ({total} cards)")
+    
+    query = st.text_input(
+        "🔍 Search cards",
+        key="card_search",
+        on_change=_reset_offsets,
+        placeholder="Words from questions or answers",
+        help="Shows cards containing every word, best matches first"
+    ).strip()
     
-    if not flashcards:
-        st.warning("No flashcards match the selected difficulty levels.")
+    # Filter by difficulty and search terms with indexed queries
+    if query:
+        total = store.count_matches(deck_id, query, difficulties)
+        load_page = lambda offset, limit: store.search_cards(deck_id, query, difficulties, offset, limit)
+    else:
+        if difficulties:
+            total = store.count_cards(deck_id, difficulties)
+        load_page = lambda offset, limit: list(
+            enumerate(store.get_cards(deck_id, difficulties, offset, limit), offset + 1)
+        )
+    
+    if not total:
+        if query:
+            st.warning("No flashcards match your search.")
+        else:
+            st.warning("No flashcards match the selected difficulty levels.")
         return
     
-    st.header(f"📚 Generated Flashcards ({len(flashcards)} cards)")
+    if query or difficulties:
+        st.caption(f"{total} matching cards")
     
     # Display mode selection
     display_mode = st.radio(
@@ -164,38 +312,141 @@ def display_flashcards(flashcards: List[Dict[str, str]], settings: Dict[str, any
     )
     
     if display_mode == "🎴 Card View":
-        _display_card_view(flashcards)
+        _display_card_view(load_page, total)
     else:
-        _display_table_view(flashcards)
+        _display_table_view(load_page, total)
+
+def _reset_offsets():
+    """Search callback: start the views again from the first match."""
+    for prefix in ("card", "table"):
+        st.session_state[f"{prefix}_offset"] = 0
+        st.session_state.pop(f"{prefix}_jump", None)
+
+def _display_card_view(load_page: Callable[[int, int], List[Tuple[int, Dict[str, str]]]], total: int):
+    """
+    Display one page of flashcards in card format.
+    
+    Only the cards on the current page are read from the store and get widgets,
+    so a rerun costs the same whatever the deck size.
+    
+    Args:
+        load_page: Returns (card number, flashcard) pairs for an offset and limit
+        total: Number of cards to page through
+    """
+    offset, end = _page_controls("card", PAGE_SIZES, total)
+    _arrow_key_navigation("◀ Previous", "Next ▶")
+    
+    for number, card in load_page(offset, end - offset):
+        display_card(card, number)
+
+def _page_controls(prefix: str, page_sizes: List[int], total: int) -> tuple:
+    """
+    Render previous/next buttons, a page size picker and a jump box.
+    
+    The position is kept in session state as ``{prefix}_offset``, the index of
+    the first visible row, which survives page size changes and filtering.
+    
+    Args:
+        prefix: Session state and widget key prefix of the view
+        page_sizes: Selectable page sizes, the first is the default
+        total: Number of rows to page through
+    
+    Returns:
+        Tuple of the first and one past the last row of the current page
+    """
+    offset_key = f"{prefix}_offset"
+    jump_key = f"{prefix}_jump"
+    page_size = st.session_state.get(f"{prefix}_page_size", page_sizes[0])
+    offset = min(st.session_state.get(offset_key, 0), total - 1)
+    offset -= offset % page_size
+    st.session_state[offset_key] = offset
+    
+    page_count = -(-total // page_size)
+    page = offset // page_size
+    
+    col1, col2, col3, col4 = st.columns([1, 2, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{prefix}_prev", disabled=page == 0,
+                  on_click=_move_offset, args=(prefix, -page_size, total))
+    with col2:
+        st.selectbox("Rows per page" if prefix == "table" else "Cards per page", page_sizes,
+                     key=f"{prefix}_page_size")
+    with col3:
+        st.number_input("Jump to card", min_value=1, max_value=total, value=offset + 1,
+                        key=jump_key, on_change=_jump_to, args=(prefix,))
+    with col4:
+        st.button("Next ▶", key=f"{prefix}_next", disabled=page >= page_count - 1,
+                  on_click=_move_offset, args=(prefix, page_size, total))
+    
+    end = min(offset + page_size, total)
+    st.caption(f"Cards {offset + 1}–{end} of {total} · Page {page + 1} of {page_count} · Use ← → to turn pages")
+    return offset, end
+
+def _move_offset(prefix: str, step: int, total: int):
+    """Button callback: move the first visible row by one page."""
+    offset = st.session_state.get(f"{prefix}_offset", 0) + step
+    st.session_state[f"{prefix}_offset"] = max(0, min(offset, total - 1))
+    st.session_state.pop(f"{prefix}_jump", None)
 
-def _display_card_view(flashcards: List[Dict[str, str]]):
-    """Display flashcards in card format."""
-    for i, card in enumerate(flashcards, 1):
-        with st.container():
-            # Card header
-            col1, col2 = st.columns([4, 1])
-            with col1:
-                st.subheader(f"Card {i}")
-            with col2:
-                if "difficulty" in card:
-                    difficulty = card["difficulty"]
-                    colors = {"Easy": "🟢", "Medium": "🟡", "Hard": "🔴"}
-                    st.write(f"{colors.get(difficulty, '⚪')} {difficulty}")
-            
-            # Question
-            st.write("**❓ Question:**")
-            st.info(card["question"])
-            
-            # Answer (collapsible)
-            with st.expander("💡 Show Answer"):
-                st.success(card["answer"])
-            
-            st.divider()
+def _jump_to(prefix: str):
+    """Number input callback: show the page holding the chosen card."""
+    st.session_state[f"{prefix}_offset"] = int(st.session_state[f"{prefix}_jump"]) - 1
 
-def _display_table_view(flashcards: List[Dict[str, str]]):
-    """Display flashcards in table format."""
+def _arrow_key_navigation(previous_label: str, next_label: str):
+    """Click the page buttons on left/right arrow keys, unless typing in a field."""
+    components.html(f"""
+<script>
+const doc = window.parent.document;
+if (!doc.flashcardArrowKeys) {{
+    doc.flashcardArrowKeys = true;
+    doc.addEventListener("keydown", (event) => {{
+        const tag = (event.target.tagName || "").toLowerCase();
+        if (tag === "input" || tag === "textarea" || event.target.isContentEditable) return;
+        const label = {{ArrowLeft: {json.dumps(previous_label)}, ArrowRight: {json.dumps(next_label)}}}[event.key];
+        if (!label) return;
+        const button = Array.from(doc.querySelectorAll("button")).find((b) => b.innerText.trim() === label);
+        if (button && !button.disabled) button.click();
+    }});
+}}
+</script>""", height=0)
+
+def display_card(card: Dict[str, str], index: int):
+    """
+    Display a single flashcard.
+    
+    Args:
+        card: Flashcard dictionary
+        index: 1-based card number shown in the header
+    """
+    with st.container():
+        # Card header
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.subheader(f"Card {index}")
+        with col2:
+            if "difficulty" in card:
+                difficulty = card["difficulty"]
+                colors = {"Easy": "🟢", "Medium": "🟡", "Hard": "🔴"}
+                st.write(f"{colors.get(difficulty, '⚪')} {difficulty}")
+        
+        # Question
+        st.write("**❓ Question:**")
+        st.info(card["question"])
+        
+        # Answer (collapsible)
+        with st.expander("💡 Show Answer"):
+            st.success(card["answer"])
+        
+        st.divider()
+
+def _display_table_view(load_page: Callable[[int, int], List[Tuple[int, Dict[str, str]]]], total: int):
+    """Display one page of flashcards in table format."""
+    offset, end = _page_controls("table", TABLE_PAGE_SIZES, total)
+    _arrow_key_navigation("◀ Previous", "Next ▶")
+    
     # Create DataFrame
-    df = pd.DataFrame(flashcards)
+    import pandas as pd
+    df = pd.DataFrame([card for _, card in load_page(offset, end - offset)])
     
     # Configure display
     st.dataframe(
@@ -213,111 +464,182 @@ def _display_table_view(flashcards: List[Dict[str, str]]):
         }
     )
 
-def download_buttons(flashcards: List[Dict[str, str]]):
+def download_buttons(store: DeckStore, deck_id: int):
     """
     Create download buttons for various formats.
     
+    Exports are only built when asked for, reading the deck from the store, and
+    are memoized in session state per deck version, so later reruns reuse the
+    bytes until the deck's cards change.
+    
     Args:
-        flashcards: List of flashcard dictionaries
+        store: Deck store holding the cards
+        deck_id: Deck to export
     """
-    if not flashcards:
+    if not store.count_cards(deck_id):
         return
     
     st.header("📤 Export Options")
     
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        # CSV Download
-        csv_data = _create_csv(flashcards)
-        st.download_button(
-            label="📊 Download CSV",
-            data=csv_data,
-            file_name="flashcards.csv",
-            mime="text/csv",
-            help="Download as CSV for spreadsheet applications"
-        )
-    
-    with col2:
-        # JSON Download
-        json_data = _create_json(flashcards)
-        st.download_button(
-            label="📋 Download JSON",
-            data=json_data,
-            file_name="flashcards.json",
-            mime="application/json",
-            help="Download as JSON for programmatic use"
-        )
-    
-    with col3:
-        # Anki Format Download
-        anki_data = _create_anki_format(flashcards)
-        st.download_button(
-            label="🎴 Download Anki Format",
-            data=anki_data,
-            file_name="flashcards_anki.txt",
-            mime="text/plain",
-            help="Download in Anki-compatible format"
-        )
+    # Deck ids are reused after a delete, and a generating deck changes as its cards are written
+    deck = store.get_deck(deck_id)
+    version = (deck_id, deck["created"], deck["version"])
+    memo = st.session_state.get("exports")
+    if memo is None or memo["version"] != version:
+        memo = {"version": version, "data": {}}
+        st.session_state.exports = memo
+    
+    columns = st.columns(len(DOWNLOADS))
+    for column, (export_format, download) in zip(columns, DOWNLOADS.items()):
+        with column:
+            data = memo["data"].get(export_format)
+            if data is None:
+                st.button(
+                    f"⚙️ Prepare {download['name']}",
+                    key=f"prepare_{export_format}",
+                    on_click=_prepare_export,
+                    args=(store, deck_id, export_format, memo),
+                    help=download["help"]
+                )
+            else:
+                st.download_button(
+                    label=download["label"],
+                    data=data,
+                    file_name=download["file_name"],
+                    mime=download["mime"],
+                    help=download["help"]
+                )
 
-def _create_csv(flashcards: List[Dict[str, str]]) -> str:
-    """Create CSV format data."""
-    df = pd.DataFrame(flashcards)
-    return df.to_csv(index=False)
+def _prepare_export(store: DeckStore, deck_id: int, export_format: str, memo: Dict[str, any]):
+    """Button callback: build one export and keep it for the current deck."""
+    memo["data"][export_format] = export_bytes(list(store.iter_cards(deck_id)), export_format)
 
-def _create_json(flashcards: List[Dict[str, str]]) -> str:
-    """Create JSON format data."""
-    return json.dumps(flashcards, indent=2, ensure_ascii=False)
-
-def _create_anki_format(flashcards: List[Dict[str, str]]) -> str:
-    """Create Anki-compatible format."""
-    anki_lines = []
-    for card in flashcards:
-        question = card["question"].replace("\n", "<br>")
-        answer = card["answer"].replace("\n", "<br>")
-        difficulty = card.get("difficulty", "Medium")
-        anki_lines.append(f"{question}\t{answer}\t{difficulty}")
-    return "\n".join(anki_lines)
-
-def display_statistics(flashcards: List[Dict[str, str]]):
+def display_statistics(store: DeckStore, deck_id: int):
     """
-    Display statistics about generated flashcards.
+    Display statistics about a stored deck.
+    
+    Counts come from the difficulty index and word totals from the deck row,
+    so no cards are loaded.
     
     Args:
-        flashcards: List of flashcard dictionaries
+        store: Deck store holding the cards
+        deck_id: Deck to describe
     """
-    if not flashcards:
+    deck = store.get_deck(deck_id)
+    if not deck or not deck["card_count"]:
         return
     
     st.header("📊 Statistics")
     
+    counts = store.difficulty_counts(deck_id)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Cards", len(flashcards))
+        st.metric("Total Cards", deck["card_count"])
     
     with col2:
-        easy_count = len([c for c in flashcards if c.get("difficulty") == "Easy"])
-        st.metric("Easy Cards", easy_count)
+        st.metric("Easy Cards", counts.get("Easy", 0))
     
     with col3:
-        medium_count = len([c for c in flashcards if c.get("difficulty") == "Medium"])
-        st.metric("Medium Cards", medium_count)
+        st.metric("Medium Cards", counts.get("Medium", 0))
     
     with col4:
-        hard_count = len([c for c in flashcards if c.get("difficulty") == "Hard"])
-        st.metric("Hard Cards", hard_count)
+        st.metric("Hard Cards", counts.get("Hard", 0))
     
     # Additional statistics
-    if flashcards:
-        avg_question_length = sum(len(card["question"].split()) for card in flashcards) / len(flashcards)
-        avg_answer_length = sum(len(card["answer"].split()) for card in flashcards) / len(flashcards)
-        
-        col5, col6 = st.columns(2)
-        with col5:
-            st.metric("Avg Question Length", f"{avg_question_length:.1f} words")
-        with col6:
-            st.metric("Avg Answer Length", f"{avg_answer_length:.1f} words")
+    avg_question_length = deck["question_words"] / deck["card_count"]
+    avg_answer_length = deck["answer_words"] / deck["card_count"]
+    
+    col5, col6 = st.columns(2)
+    with col5:
+        st.metric("Avg Question Length", f"{avg_question_length:.1f} words")
+    with col6:
+        st.metric("Avg Answer Length", f"{avg_answer_length:.1f} words")
+
+def metrics_panel(summary: Optional[Dict[str, any]]):
+    """
+    Show where the time and tokens of the last generation run went.
+    
+    Meant to be drawn inside a sidebar container. The history of all logged
+    runs can be downloaded as CSV to follow cost and latency per document.
+    
+    Args:
+        summary: Run summary from RunMetrics.finish(), or None before the first run
+    """
+    st.header("⏱️ Last Run")
+    if not summary:
+        st.caption("Timings appear here after generating flashcards.")
+        return
+    
+    totals = summary["totals"]
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Total Time", f"{totals['seconds']:.1f}s")
+        st.metric("Tokens", totals["prompt_tokens"] + totals["completion_tokens"])
+    with col2:
+        st.metric("API Calls", totals["api_calls"])
+        st.metric("Retries", totals["retries"])
+    
+    if summary.get("error"):
+        st.caption(f"Failed: {summary['error']}")
+    
+    stages = [
+        {"Stage": name.replace("_", " "), "Seconds": round(stage["seconds"], 3), "Count": stage["count"]}
+        for name, stage in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"])
+    ]
+    if totals["api_calls"]:
+        stages.append({"Stage": "api calls", "Seconds": round(totals["api_seconds"], 3), "Count": totals["api_calls"]})
+    if stages:
+        import pandas as pd
+        st.dataframe(pd.DataFrame(stages), hide_index=True, use_container_width=True)
+    
+    if summary["counters"]:
+        st.caption(" · ".join(f"{name.replace('_', ' ')}: {count}" for name, count in summary["counters"].items()))
+    if summary.get("profile"):
+        st.caption(f"Profile saved to {summary['profile']}")
+    
+    history = st.session_state.get("run_history")
+    if history is None:
+        st.button("📈 Prepare Run History", key=f"prepare_history_{summary['run_id']}",
+                  on_click=_prepare_run_history, help="Collect all logged runs as CSV")
+    else:
+        st.download_button("📈 Download Run History", data=history, file_name="flashcard_runs.csv",
+                           mime="text/csv", key=f"history_{summary['run_id']}")
+
+def _prepare_run_history():
+    """Button callback: read the run log once the history is asked for."""
+    st.session_state.run_history = runs_csv(load_runs())
+
+def job_progress(job: Dict[str, any], show_cards: bool, on_cancel: Callable[[], None]):
+    """
+    Show how far a background generation job is, with a button to cancel it.
+    
+    Args:
+        job: Job snapshot from Job.snapshot()
+        show_cards: Preview the newest cards of the snapshot
+        on_cancel: Button callback cancelling the job
+    """
+    total = job["chunks_total"]
+    if job["status"] == "queued":
+        st.progress(0.0, text=f"⏳ Waiting for a free worker to process {job['label']}...")
+    elif total:
+        st.progress(job["chunks_done"] / total,
+                    text=f"🔄 Generating flashcards: {job['chunks_done']} of {total} chunks done")
+    else:
+        st.progress(0.0, text=f"🔄 Reading pages and generating flashcards: {job['chunks_done']} chunks done")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"{job['card_count']} cards so far · {job['seconds']:.0f}s elapsed · "
+                   "you can keep using the app while this runs")
+    with col2:
+        st.button("⏹️ Cancel", key=f"cancel_{job['id']}", on_click=on_cancel, use_container_width=True)
+    
+    if show_cards and job["cards"]:
+        # Newest cards first; the full deck view replaces the preview when the job is done
+        first = job["card_count"] - len(job["cards"]) + 1
+        for index, card in reversed(list(enumerate(job["cards"], first))):
+            display_card(card, index)
 
 def show_error_message(error_msg: str):
     """